@@ -0,0 +1,239 @@
+"""Times the headless parts of animationToolCore on synthetic rigs, without Maya.
+
+    python animationToolBenchmark.py --sizes 100 1000 10000 --report benchmark.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from animationToolCore import (ConstrainEnum, HierarchyTree, InMemoryConstraintBackend, MatchingModel,
+                               NameMatcher, NamespaceRemapRule, numpy, pymel)
+
+
+class InMemoryPyNode(object):
+
+    def __init__(self, scene: "InMemoryPymel", index: int):
+        self.scene = scene
+        self.index = index
+
+    def name(self) -> str:
+        return self.scene.names[self.index]
+
+    def fullPath(self) -> str:
+        return self.scene.paths[self.index]
+
+    def __str__(self):
+        return self.name()
+
+
+class InMemoryPymel(object):
+    # the few scene queries of the headless code paths, answered from a synthetic hierarchy
+
+    def __init__(self, names: list, parents: list, positions: list):
+        self.names = names
+        self.positions = positions
+        self.children = [[] for i in range(len(names))]
+        self.paths = [""] * len(names)
+        for i, parent in enumerate(parents):
+            if parent != -1:
+                self.children[parent].append(i)
+        for i, parent in enumerate(parents):
+            # parents always come before their children
+            self.paths[i] = "{}|{}".format(self.paths[parent] if parent != -1 else "", names[i])
+        self.indices = {name: i for i, name in enumerate(names)}
+
+    def PyNode(self, node) -> InMemoryPyNode:
+        if isinstance(node, InMemoryPyNode):
+            return node
+        if node not in self.indices:
+            raise ValueError("No object matches name: {}".format(node))
+        return InMemoryPyNode(self, self.indices[node])
+
+    def listRelatives(self, node, allDescendents: bool = False, type: str = None) -> list:
+        node = self.PyNode(node)
+        if not allDescendents:
+            return [InMemoryPyNode(self, i) for i in self.children[node.index]]
+        # same order as Maya: deepest last created nodes first
+        descendants = []
+        stack = list(self.children[node.index])
+        while len(stack) > 0:
+            i = stack.pop()
+            descendants.append(i)
+            stack.extend(self.children[i])
+        return [InMemoryPyNode(self, i) for i in reversed(descendants)]
+
+    def xform(self, nodes, query: bool = False, worldSpace: bool = False, translation: bool = False) -> list:
+        return [value for node in nodes for value in self.positions[self.PyNode(node).index]]
+
+
+class SyntheticRig(object):
+    # joint hierarchies for benchmarks, branching rigs spread wide and chain rigs are mostly long single child chains
+    shapes = ("branching", "chain")
+
+    @staticmethod
+    def generate(joint_count: int, shape: str, namespace: str, seed: int = 0) -> tuple:
+        generator = random.Random(seed)
+        parents = [-1]
+        if shape == "branching":
+            for i in range(1, joint_count):
+                parents.append((i - 1) // 4)
+        elif shape == "chain":
+            chain_length = 20
+            for i in range(1, joint_count):
+                parents.append(i - 1 if i % chain_length != 1 else generator.randrange(0, i))
+        else:
+            raise ValueError("unknown rig shape: {}".format(shape))
+
+        names = ["{}:joint{}".format(namespace, i) for i in range(joint_count)]
+        positions = [[0.0, 0.0, 0.0]]
+        for i in range(1, joint_count):
+            offset = [generator.uniform(-1.0, 1.0), generator.uniform(0.5, 1.5), generator.uniform(-1.0, 1.0)]
+            positions.append([a + b for a, b in zip(positions[parents[i]], offset)])
+        return names, parents, positions
+
+
+class BenchmarkSuite(object):
+    # times the headless parts of the tool on synthetic rigs, the numbers are comparable between commits
+    steps = ("buildModel", "sceneTree", "nameMatch", "topologyMatch", "jsonSave", "jsonLoad", "applyPlan",
+             "validate", "apply")
+
+    def __init__(self, sizes: list, shapes: list, repeat: int = 3, directory: str = ""):
+        self.sizes = sizes
+        self.shapes = shapes
+        self.repeat = max(1, repeat)
+        self.directory = directory
+
+    def run(self) -> dict:
+        results = []
+        real_pymel = pymel._module
+        temporary_directory = self.directory == ""
+        if temporary_directory:
+            self.directory = tempfile.mkdtemp(prefix="constraintsMatchingBenchmark")
+        try:
+            # the tool's own prints would end up in the json report when it goes to stdout
+            with contextlib.redirect_stdout(io.StringIO()):
+                for shape in self.shapes:
+                    for size in self.sizes:
+                        results.extend(self._run_case(shape, size))
+        finally:
+            pymel.lazy_set_module(real_pymel)
+            if temporary_directory:
+                shutil.rmtree(self.directory, ignore_errors=True)
+                self.directory = ""
+
+        return {
+            "format": "constraintsMatchingBenchmark",
+            "version": 1,
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "numpy": numpy.lazy_is_available(),
+            "repeat": self.repeat,
+            "results": results
+        }
+
+    def _run_case(self, shape: str, size: int) -> list:
+        source_names, parents, positions = SyntheticRig.generate(size, shape, "source")
+        target_names, target_parents, target_positions = SyntheticRig.generate(size, shape, "target")
+        source_scene = InMemoryPymel(source_names, parents, positions)
+        target_scene = InMemoryPymel(target_names, target_parents, target_positions)
+        file_name = os.path.join(self.directory, "constraintsMatchingBenchmark_{}_{}.json".format(shape, size))
+        scene_nodes = source_names + target_names
+        state = {}
+
+        def build_model():
+            pymel.lazy_set_module(source_scene)
+            state["model"] = MatchingModel.from_hierarchy(source_names[0])
+
+        def scene_tree():
+            pymel.lazy_set_module(source_scene)
+            state["sourceTree"] = HierarchyTree.from_scene(source_names[0], with_positions=True)
+            pymel.lazy_set_module(target_scene)
+            state["targetTree"] = HierarchyTree.from_scene(target_names[0], with_positions=True)
+
+        def name_match():
+            return state["model"].auto_match(target_names, NameMatcher([NamespaceRemapRule("source", "target")]),
+                                              overwrite=True)
+
+        def topology_match():
+            confidences = state["model"].topology_match(state["sourceTree"], state["targetTree"], overwrite=True)
+            return sum(1 for confidence in confidences if confidence > 0.0)
+
+        def set_constraints():
+            model = state["model"]
+            for i in range(len(model)):
+                model.set_constraint(i, ConstrainEnum.PARENT_CONSTRAIN if i % 3 else ConstrainEnum.ORIENT_CONSTRAIN,
+                                     (False, i % 5 == 0, False))
+
+        steps = {
+            "buildModel": build_model,
+            "sceneTree": scene_tree,
+            "nameMatch": name_match,
+            "topologyMatch": topology_match,
+            "jsonSave": lambda: state["model"].save(file_name),
+            "jsonLoad": lambda: len(MatchingModel.from_json(file_name)),
+            "applyPlan": lambda: state["model"].get_apply_plan().get_constraints_count(),
+            "validate": lambda: len(state["model"].validate(InMemoryConstraintBackend(scene_nodes))["errors"]),
+            "apply": lambda: len(state["model"].apply(InMemoryConstraintBackend(scene_nodes))["nodes"])
+        }
+
+        results = []
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            for step in self.steps:
+                if step == "topologyMatch" and not numpy.lazy_is_available():
+                    continue
+                if step == "jsonSave":
+                    set_constraints()
+                times = []
+                value = None
+                for i in range(self.repeat):
+                    start_time = time.perf_counter()
+                    value = steps[step]()
+                    times.append(time.perf_counter() - start_time)
+                times.sort()
+                results.append({
+                    "shape": shape,
+                    "joints": size,
+                    "step": step,
+                    "min": times[0],
+                    "median": times[len(times) // 2],
+                    "value": value
+                })
+        finally:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+        return results
+
+
+def get_arguments_parser():
+    parser = argparse.ArgumentParser(description="Times the tool on synthetic rigs, without Maya.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="joints per rig")
+    parser.add_argument("--shapes", nargs="+", choices=SyntheticRig.shapes, default=list(SyntheticRig.shapes))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per step, the min and median are reported")
+    parser.add_argument("--directory", default="", help="where the mapping files are written, a temporary directory when not given")
+    parser.add_argument("--report", default="", help="json report file, printed when not given")
+    return parser
+
+
+def main(argv: list = None) -> int:
+    arguments = get_arguments_parser().parse_args(argv)
+    report = BenchmarkSuite(arguments.sizes, arguments.shapes, arguments.repeat, arguments.directory).run()
+
+    if arguments.report != "":
+        with open(arguments.report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        print("++++ report saved to {} ++++".format(arguments.report))
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4124 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from enum import Enum
+import cProfile
+import difflib
+import fnmatch
+import functools
+import glob
+import gzip
+import hashlib
+import importlib
+import inspect
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+
+
+class LazyModule(object):
+    # heavy modules are only imported on first use, opening the tool must not pay for PyMEL or numpy before it
+    # needs them. Outside of Maya only the headless parts (plans, in memory backends, serialization) are usable.
+    # Method names carry a prefix so the wrapped modules' own attributes (numpy.load...) stay reachable
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def lazy_load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def lazy_is_loaded(self) -> bool:
+        return self._module is not None
+
+    def lazy_set_module(self, module):
+        # stand-ins for offline runs, None goes back to importing the real module
+        self._module = module
+
+    def lazy_is_available(self) -> bool:
+        try:
+            self.lazy_load()
+        except ImportError:
+            return False
+        return True
+
+    def __getattr__(self, attribute: str):
+        value = getattr(self.lazy_load(), attribute)
+        # only plain functions are counted, callable objects like pymel.optionVar keep their own interface
+        if PERFORMANCE_STATS.countCommands and self._name != "numpy" and inspect.isroutine(value):
+            return PERFORMANCE_STATS.counted_command(self._name, attribute, value)
+        return value
+
+
+class PerformanceStats(object):
+    # per operation timings are always recorded, command counting and cProfile capture are opt-in
+    widgetCommands = {
+        "button", "checkBox", "checkBoxGrp", "columnLayout", "floatFieldGrp", "frameLayout", "intField",
+        "menuItem", "optionMenu", "rowLayout", "scrollLayout", "separator", "text", "textField",
+        "textFieldButtonGrp", "textFieldGrp", "textScrollList", "window"
+    }
+
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+        self.countCommands = False
+        self.profiler = None
+        self._depth = 0
+
+    def reset(self):
+        self.timings.clear()
+        self.counters.clear()
+        if self.profiler is not None:
+            self.profiler = cProfile.Profile()
+
+    def set_profiling(self, enabled: bool):
+        self.profiler = cProfile.Profile() if enabled else None
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_timing(self, name: str, seconds: float):
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = {"calls": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+        timing["calls"] += 1
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+        timing["last"] = seconds
+
+    def counted_command(self, module_name: str, name: str, command):
+        def wrapper(*args, **kwargs):
+            self.count("commands")
+            self.count("command.{}.{}".format(module_name, name))
+            if name in self.widgetCommands and not kwargs.get("edit") and not kwargs.get("query"):
+                self.count("widgets")
+            return command(*args, **kwargs)
+        return wrapper
+
+    def timed(self, name: str):
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                # only the outermost timed call drives the profiler, nested ones are part of its capture
+                profiler = self.profiler if self._depth == 0 else None
+                self._depth += 1
+                if profiler is not None:
+                    profiler.enable()
+                start_time = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.add_timing(name, time.perf_counter() - start_time)
+                    if profiler is not None:
+                        profiler.disable()
+                    self._depth -= 1
+            return wrapper
+        return decorator
+
+    def get_report(self) -> dict:
+        return {"timings": {name: dict(timing) for name, timing in self.timings.items()},
+                "counters": dict(self.counters)}
+
+    def print_report(self):
+        for name, timing in sorted(self.timings.items()):
+            print("++++ {}: {} calls, total {:.1f}ms, avg {:.1f}ms, max {:.1f}ms, last {:.1f}ms ++++".format(
+                name, timing["calls"], timing["total"] * 1000, timing["total"] / timing["calls"] * 1000,
+                timing["max"] * 1000, timing["last"] * 1000))
+        for name, value in sorted(self.counters.items()):
+            print("++++ {}: {} ++++".format(name, value))
+
+    def save_profile(self, file_name: str) -> bool:
+        if self.profiler is None:
+            return False
+        self.profiler.dump_stats(file_name)
+        return True
+
+
+PERFORMANCE_STATS = PerformanceStats()
+
+
+pymel = LazyModule("pymel.core")
+OpenMaya = LazyModule("maya.api.OpenMaya")
+OpenMayaAnim = LazyModule("maya.api.OpenMayaAnim")
+numpy = LazyModule("numpy")
+cmds = LazyModule("maya.cmds")
+mayaUtils = LazyModule("maya.utils")
+
+
+class ConstrainEnum(Enum):
+    PARENT_CONSTRAIN = 0
+    POINT_CONSTRAIN = 1
+    ORIENT_CONSTRAIN = 2
+    SCALE_CONSTRAIN = 3
+    PARENT_NODE = "parentConstraint"
+    POINT_NODE = "pointConstraint"
+    ORIENT_NODE = "orientConstraint"
+    SCALE_NODE = "scaleConstraint"
+
+
+class Constrain(object):
+
+    def __init__(self, constrain: ConstrainEnum):
+        self.constrainEnum = constrain
+        self.skipX = False
+        self.skipY = False
+        self.skipZ = False
+
+    def update_skip_axe(self, axe: str, value: bool):
+        if axe == "X":
+            self.skipX = value
+        elif axe == "Y":
+            self.skipY = value
+        elif axe == "Z":
+            self.skipZ = value
+
+    def get_axes_tuple(self) -> (bool, bool, bool):
+        return self.skipX, self.skipY, self.skipZ
+
+    def get_signature(self) -> tuple:
+        return self.constrainEnum, self.get_axes_tuple()
+
+    def get_skip_mask(self) -> int:
+        return int(self.skipX) | int(self.skipY) << 1 | int(self.skipZ) << 2
+
+    @classmethod
+    def from_skip_mask(cls, constrain_enum: ConstrainEnum, mask: int) -> "Constrain":
+        constrain = cls(constrain_enum)
+        constrain.skipX = bool(mask & 1)
+        constrain.skipY = bool(mask & 2)
+        constrain.skipZ = bool(mask & 4)
+        return constrain
+
+    def get_serialized_dict(self) -> dict:
+        return {
+            "constraint": self.constrainEnum.value,
+            "x": self.skipX,
+            "y": self.skipY,
+            "z": self.skipZ
+        }
+
+    def __str__(self):
+        return "constraint: {}, skip axes[ x:{}, y:{}, z:{} ]".format(
+            self.constrainEnum.value,
+            self.skipX,
+            self.skipY,
+            self.skipZ
+        )
+
+
+class ConstrainSerialized(Constrain):
+
+    def __init__(self, serialized_data: dict):
+        constrain_enum = ConstrainEnum(int(serialized_data['constraint']))
+        Constrain.__init__(self, constrain_enum)
+        self.skipX = serialized_data['x']
+        self.skipY = serialized_data['y']
+        self.skipZ = serialized_data['z']
+
+
+class JsonDataManager(object):
+    # version 1 files are a single json object with three parallel arrays, version 2 files are line delimited:
+    # a header holding a shared table of [constraint, skip axes bitmask] specs, then one [source, target,
+    # [spec indices]] row per line. Files ending with ".gz" are gzip compressed.
+    fileFormat = "constraintsMatching"
+    version = 2
+
+    def __init__(self):
+        self.data = {}
+        self.sourcesKey = "sources"
+        self.targetsKey = "targets"
+        self.constraintsKey = "constraints"
+        return
+
+    def set_data(self, sources: list, targets: list, constraints: list):
+        if len(sources) != len(targets) or len(targets) != len(constraints):
+            return
+
+        self.data = {
+            self.sourcesKey: sources,
+            self.targetsKey: targets,
+            self.constraintsKey: constraints
+        }
+
+    @PERFORMANCE_STATS.timed("json.save")
+    def save(self, file_name):
+        if file_name is None:
+            print("++++ Invalid File : {} it couldn't be saved".format(file_name))
+            return
+
+        sources = self.data.get(self.sourcesKey, [])
+        targets = self.data.get(self.targetsKey, [])
+        specs, rows_specs = self._get_specs_table(self.data.get(self.constraintsKey, []))
+        header = {"format": self.fileFormat, "version": self.version, "rows": len(sources), "specs": specs}
+
+        with self._open(file_name, "w") as save_file:
+            save_file.write(json.dumps(header, separators=(",", ":")) + "\n")
+            save_file.writelines(
+                json.dumps([sources[i], targets[i], rows_specs[i]], separators=(",", ":")) + "\n"
+                for i in range(len(sources))
+            )
+
+        print("++++ File {} saved ++++".format(file_name))
+
+    @PERFORMANCE_STATS.timed("json.load")
+    def load(self, file_name) -> bool:
+        if file_name is None:
+            print("++++ Invalid File : {} it couldn't be loaded".format(file_name))
+            return False
+
+        sources, targets, constraints = [], [], []
+        try:
+            for source, target, row_constraints in self.iter_rows(file_name):
+                sources.append(source)
+                targets.append(target)
+                constraints.append(row_constraints)
+        except (ValueError, KeyError, TypeError, IndexError):
+            return False
+
+        self.set_data(sources, targets, constraints)
+        print("++++ File {} Loading ++++".format(file_name))
+        return True
+
+    @classmethod
+    def iter_rows(cls, file_name):
+        # yields (source, target, {ConstrainEnum: Constrain}) rows without holding the whole file in memory
+        with cls._open(file_name, "r") as load_file:
+            first_line = load_file.readline()
+            try:
+                header = json.loads(first_line)
+            except ValueError:
+                header = None
+
+            if isinstance(header, dict) and header.get("format") == cls.fileFormat:
+                if header["version"] > cls.version:
+                    raise ValueError("unsupported mapping file version {}".format(header["version"]))
+                specs = [(ConstrainEnum(int(constrain)), int(mask)) for constrain, mask in header["specs"]]
+                for line in load_file:
+                    if line.strip() == "":
+                        continue
+                    source, target, spec_indices = json.loads(line)
+                    row_constraints = {}
+                    for spec_index in spec_indices:
+                        constrain_enum, mask = specs[spec_index]
+                        row_constraints[constrain_enum] = Constrain.from_skip_mask(constrain_enum, mask)
+                    yield source, target, row_constraints
+                return
+
+            # version 1, a single (maybe indented) json object
+            data = header if isinstance(header, dict) else json.loads(first_line + load_file.read())
+            legacy_data = JsonDataManager()
+            if not legacy_data._check_correct_format(data):
+                raise ValueError("{} is not a constraints matching file".format(file_name))
+            constraints = cls._deserialized_constraints_data(data[legacy_data.constraintsKey])
+            for row in zip(data[legacy_data.sourcesKey], data[legacy_data.targetsKey], constraints):
+                yield row
+
+    @staticmethod
+    def _open(file_name, mode: str):
+        if str(file_name).endswith(".gz"):
+            return gzip.open(file_name, mode + "t", encoding="utf-8")
+        return open(file_name, mode, encoding="utf-8")
+
+    def _check_correct_format(self, data: dict) -> bool:
+        return self.sourcesKey in data.keys() and \
+               self.targetsKey in data.keys() and \
+               self.constraintsKey in data.keys()
+
+    def get_data(self, key):
+        if key == "t":
+            key = self.targetsKey
+        elif key == "s":
+            key = self.sourcesKey
+        elif key == "c":
+            key = self.constraintsKey
+        else:
+            key = ""
+
+        if key in self.data.keys():
+            return self.data[key]
+        else:
+            return []
+
+    @staticmethod
+    def _get_specs_table(constraints: list) -> (list, list):
+        specs = []
+        spec_indices = {}
+        rows_specs = []
+        for row_constraints in constraints:
+            row_specs = []
+            for constrain in row_constraints.values():
+                spec = (constrain.constrainEnum.value, constrain.get_skip_mask())
+                if spec not in spec_indices:
+                    spec_indices[spec] = len(specs)
+                    specs.append(list(spec))
+                row_specs.append(spec_indices[spec])
+            rows_specs.append(row_specs)
+        return specs, rows_specs
+
+    @staticmethod
+    def _deserialized_constraints_data(constraints: list) -> list:
+        constraints_deserialized = [{} for i in range(len(constraints))]
+        for i in range(len(constraints)):
+            for key, value in constraints[i].items():
+                if len(constraints[i][key]) > 0:
+                    constraint_enum_key = ConstrainEnum(int(key))
+                    constraints_deserialized[i][constraint_enum_key] = ConstrainSerialized(value)
+
+        return constraints_deserialized
+
+
+CONSTRAIN_COMMANDS = {
+    ConstrainEnum.PARENT_CONSTRAIN: ConstrainEnum.PARENT_NODE.value,
+    ConstrainEnum.POINT_CONSTRAIN: ConstrainEnum.POINT_NODE.value,
+    ConstrainEnum.ORIENT_CONSTRAIN: ConstrainEnum.ORIENT_NODE.value,
+    ConstrainEnum.SCALE_CONSTRAIN: ConstrainEnum.SCALE_NODE.value
+}
+
+CONSTRAIN_TYPES = {node_type: constrain_enum for constrain_enum, node_type in CONSTRAIN_COMMANDS.items()}
+
+AXES_NAMES = ("x", "y", "z")
+
+CHANNEL_NAMES = tuple(channel + axe for channel in ("t", "r", "s") for axe in AXES_NAMES)
+
+# axes of Maya's rotateOrder enum values, in the order they are applied: xyz, yzx, zxy, xzy, yxz, zyx
+ROTATE_ORDERS = ((0, 1, 2), (1, 2, 0), (2, 0, 1), (0, 2, 1), (1, 0, 2), (2, 1, 0))
+
+REGISTRY_SET_NAME = "constraintsMatchingTool_SET"
+
+WRITE_CURVES_COMMAND = "constraintsMatchingWriteCurves"
+
+MAPPING_FILE_FILTER = "Mapping files (*.json *.json.gz)"
+
+PRESETS_DIRECTORY_OPTION_VAR = "constraintsMatchingToolPresetsDirectory"
+
+CONSTRAIN_CHANNELS = {
+    ConstrainEnum.PARENT_CONSTRAIN: ("t", "r"),
+    ConstrainEnum.POINT_CONSTRAIN: ("t",),
+    ConstrainEnum.ORIENT_CONSTRAIN: ("r",),
+    ConstrainEnum.SCALE_CONSTRAIN: ("s",)
+}
+
+
+class ConstraintApplyPlan(object):
+    # rows grouped by (ConstrainEnum, skip axes tuple), so every group shares the same command flags
+
+    def __init__(self):
+        self.groups = {}
+        self.rowsCount = 0
+        self.skippedRows = []
+        # target -> registry scope, for plans combining several instances. Other targets use the applier's scope
+        self.targetScopes = {}
+
+    @classmethod
+    def from_rows(cls, sources: list, targets: list, constraints: list) -> "ConstraintApplyPlan":
+        plan = cls()
+        plan.rowsCount = len(sources)
+        for i in range(len(sources)):
+            if targets[i] == "" or len(constraints[i]) == 0:
+                plan.skippedRows.append(i)
+                continue
+
+            for constrain in constraints[i].values():
+                plan.add(constrain.get_signature(), sources[i], targets[i])
+
+        return plan
+
+    def add(self, signature: tuple, source: str, target: str):
+        if signature not in self.groups:
+            self.groups[signature] = []
+        self.groups[signature].append((source, target))
+
+    def get_driven_attributes(self) -> list:
+        attributes = set()
+        for (constrain_enum, skip_axes), pairs in self.groups.items():
+            channels = CONSTRAIN_CHANNELS[constrain_enum]
+            for source, target in pairs:
+                for channel in channels:
+                    for axe, skip in zip(AXES_NAMES, skip_axes):
+                        if not skip:
+                            attributes.add("{}.{}{}".format(target, channel, axe))
+        return sorted(attributes)
+
+    def get_constraints_count(self) -> int:
+        return sum(len(pairs) for pairs in self.groups.values())
+
+    def is_empty(self) -> bool:
+        return len(self.groups) == 0
+
+
+class ConstraintBackend(ABC):
+    # the applier only talks to the scene through this interface
+
+    @abstractmethod
+    def open_undo_chunk(self, name: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def close_undo_chunk(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def cancel_undo_chunk(self) -> bool:
+        # closes the open chunk and reverts everything done in it. False when it can't, the chunk is left open
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_constraints(self, constrain_enum: ConstrainEnum, skip_axes: tuple, pairs: list) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def bake(self, attributes: list, start: float, end: float):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_nodes(self, nodes: list):
+        raise NotImplementedError
+
+    @abstractmethod
+    def register_nodes(self, nodes: list, scope: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_registered_nodes(self, scope: str = None) -> list:
+        # registry containers (sets...) are returned after the nodes so they are deleted together with them
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_nodes_info(self, nodes: list) -> dict:
+        # name -> {"matches": nodes matching the name, "locked", "constrained" and "connected": channels}
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_constraints(self, targets: list) -> list:
+        # constraints of the tool's types driving the targets:
+        # [{"name", "type": ConstrainEnum, "target": name as given, "sources": [names], "skip": axes tuple}]
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_canonical_names(self, nodes: list) -> dict:
+        # name -> the name get_constraints reports for the same node
+        raise NotImplementedError
+
+    @staticmethod
+    def get_scope_name(scope: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_]", "_", scope)
+
+
+class NodeHandleCache(object):
+    # name -> MObjectHandle, resolved once and dropped by the rename, delete and add callbacks of the nodes
+    # involved, so applying the same mapping again doesn't go through name lookups. Handles are only cached while
+    # the callbacks are installed, for as long as one owner (the plug-in, the tool window, a batch process) holds
+    # them. DAG paths are rebuilt from the handle on demand, names given as paths are checked against it on every hit
+    _plugIndexPattern = re.compile(r"^(\w+)\[(\d+)\]$")
+
+    def __init__(self):
+        self._handles = {}
+        self._namesByHash = {}
+        self._namesByShortName = {}
+        self._callbacks = []
+        self._owners = set()
+        self.hits = 0
+        self.misses = 0
+
+    def install_callbacks(self, owner: str):
+        self._owners.add(owner)
+        if len(self._callbacks) > 0:
+            return
+
+        self._callbacks = [
+            OpenMaya.MNodeMessage.addNameChangedCallback(OpenMaya.MObject.kNullObj, self._on_node_renamed),
+            OpenMaya.MDGMessage.addNodeRemovedCallback(self._on_node_removed, "dependNode"),
+            OpenMaya.MDGMessage.addNodeAddedCallback(self._on_node_added, "dependNode")
+        ]
+
+    def remove_callbacks(self, owner: str = None):
+        # the callbacks are removed with the last owner, or right away when no owner is given
+        if owner is None:
+            self._owners.clear()
+        else:
+            self._owners.discard(owner)
+        if len(self._owners) > 0:
+            return
+
+        if len(self._callbacks) > 0:
+            OpenMaya.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+        self.clear()
+
+    def clear(self):
+        self._handles.clear()
+        self._namesByHash.clear()
+        self._namesByShortName.clear()
+
+    def _on_node_renamed(self, node, previous_name, *args):
+        self.invalidate_node(node)
+        self.invalidate_short_name(OpenMaya.MFnDependencyNode(node).name())
+
+    def _on_node_removed(self, node, *args):
+        self.invalidate_node(node)
+
+    def _on_node_added(self, node, *args):
+        # a new node can make a cached short name ambiguous
+        self.invalidate_short_name(OpenMaya.MFnDependencyNode(node).name())
+
+    def invalidate_node(self, node):
+        for name in self._namesByHash.pop(OpenMaya.MObjectHandle(node).hashCode(), []):
+            self._forget(name)
+
+    def invalidate_short_name(self, short_name: str):
+        for name in list(self._namesByShortName.get(short_name, [])):
+            self._forget(name)
+
+    def _forget(self, name: str):
+        if self._handles.pop(name, None) is None:
+            return
+        short_name = name.rsplit("|", 1)[-1]
+        names = self._namesByShortName.get(short_name, [])
+        if name in names:
+            names.remove(name)
+
+    def resolve(self, name: str):
+        # MObjectHandle or None for missing/ambiguous names
+        handle = self._handles.get(name)
+        if handle is not None and handle.isValid():
+            if "|" not in name or self._matches_path(handle, name):
+                self.hits += 1
+                return handle
+            # a parent was renamed or the node reparented, no callback of the node itself tells
+            self._forget(name)
+
+        self.misses += 1
+        selection_list = OpenMaya.MSelectionList()
+        try:
+            selection_list.add(name)
+        except RuntimeError:
+            return None
+        # a non unique name is added once per matching node rather than raising
+        if selection_list.length() != 1:
+            return None
+
+        handle = OpenMaya.MObjectHandle(selection_list.getDependNode(0))
+        if len(self._callbacks) == 0:
+            # nothing would tell a rename
+            return handle
+        self._handles[name] = handle
+        self._namesByHash.setdefault(handle.hashCode(), []).append(name)
+        self._namesByShortName.setdefault(name.rsplit("|", 1)[-1], []).append(name)
+        return handle
+
+    @staticmethod
+    def _matches_path(handle, name: str) -> bool:
+        path = OpenMaya.MDagPath.getAPathTo(handle.object()).fullPathName()
+        return path == name or path.endswith("|" + name)
+
+    def get_node(self, name: str):
+        handle = self.resolve(name)
+        return handle.object() if handle is not None else None
+
+    def get_dag_path(self, name: str):
+        node = self.get_node(name)
+        if node is None or not node.hasFn(OpenMaya.MFn.kDagNode):
+            return None
+        return OpenMaya.MDagPath.getAPathTo(node)
+
+    def get_path_name(self, name: str) -> str:
+        # full DAG path, commands given a full path don't have to search the scene for the short name
+        dag_path = self.get_dag_path(name)
+        return dag_path.fullPathName() if dag_path is not None else name
+
+    def get_plug(self, plug_name: str):
+        node_name, separator, attribute = plug_name.partition(".")
+        node = self.get_node(node_name)
+        if node is None:
+            raise RuntimeError("No object matches name: {}".format(node_name))
+
+        index_match = self._plugIndexPattern.match(attribute)
+        if index_match is not None:
+            plug = OpenMaya.MFnDependencyNode(node).findPlug(index_match.group(1), False)
+            return plug.elementByLogicalIndex(int(index_match.group(2)))
+        return OpenMaya.MFnDependencyNode(node).findPlug(attribute, False)
+
+
+NODE_HANDLE_CACHE = NodeHandleCache()
+
+
+class MayaConstraintBackend(ConstraintBackend):
+
+    def open_undo_chunk(self, name: str):
+        self._chunkName = name
+        pymel.undoInfo(openChunk=True, chunkName=name)
+
+    def close_undo_chunk(self):
+        pymel.undoInfo(closeChunk=True)
+
+    def cancel_undo_chunk(self) -> bool:
+        if not pymel.undoInfo(query=True, state=True):
+            return False
+
+        pymel.undoInfo(closeChunk=True)
+        # an empty chunk isn't recorded, undo would revert the user's previous action instead
+        if pymel.undoInfo(query=True, undoName=True) == self._chunkName:
+            pymel.undo()
+        return True
+
+    def create_constraints(self, constrain_enum: ConstrainEnum, skip_axes: tuple, pairs: list) -> list:
+        # a whole group is sent as a single MEL batch: no PyNode resolution and one command dispatch per group
+        command = "{} -maintainOffset{}".format(CONSTRAIN_COMMANDS[constrain_enum],
+                                                self.get_skip_flags(constrain_enum, skip_axes))
+        batch = "string $cmtCreated[] = {};"
+        batch += "".join('$cmtCreated = stringArrayCatenate($cmtCreated, `{} "{}" "{}"`);'.format(
+            command, NODE_HANDLE_CACHE.get_path_name(source), NODE_HANDLE_CACHE.get_path_name(target))
+            for source, target in pairs)
+        batch += 'stringArrayToString($cmtCreated, " ");'
+        PERFORMANCE_STATS.count("constraints", len(pairs))
+        return OpenMaya.MGlobal.executeCommandStringResult(batch, False, True).split()
+
+    def bake(self, attributes: list, start: float, end: float):
+        # one bakeResults call for every target, without redrawing the viewport on each frame
+        pymel.refresh(suspend=True)
+        try:
+            pymel.bakeResults(
+                attributes,
+                time=(start, end),
+                simulation=True,
+                sampleBy=1,
+                preserveOutsideKeys=True,
+                disableImplicitControl=True,
+                minimizeRotation=True
+            )
+        finally:
+            pymel.refresh(suspend=False)
+
+    def delete_nodes(self, nodes: list):
+        if len(nodes) > 0:
+            pymel.delete([NODE_HANDLE_CACHE.get_path_name(node) for node in nodes])
+
+    def register_nodes(self, nodes: list, scope: str):
+        # created constraints are tagged through a set per mapping, nested in the tool's registry set
+        if len(nodes) == 0:
+            return
+
+        scope_set = "{}_{}".format(REGISTRY_SET_NAME, self.get_scope_name(scope))
+        if not pymel.objExists(REGISTRY_SET_NAME):
+            pymel.sets(name=REGISTRY_SET_NAME, empty=True)
+        if not pymel.objExists(scope_set):
+            pymel.sets(name=scope_set, empty=True)
+            pymel.sets(REGISTRY_SET_NAME, addElement=scope_set)
+        pymel.sets(scope_set, addElement=nodes)
+
+    def get_registered_nodes(self, scope: str = None) -> list:
+        if not pymel.objExists(REGISTRY_SET_NAME):
+            return []
+
+        if scope is None:
+            scope_sets = [scope_set.name() for scope_set in pymel.sets(REGISTRY_SET_NAME, query=True) or []]
+            containers = scope_sets + [REGISTRY_SET_NAME]
+        else:
+            scope_set = "{}_{}".format(REGISTRY_SET_NAME, self.get_scope_name(scope))
+            if not pymel.objExists(scope_set):
+                return []
+            scope_sets = [scope_set]
+            containers = scope_sets
+
+        nodes = []
+        for scope_set in scope_sets:
+            nodes.extend(node.name() for node in pymel.sets(scope_set, query=True) or [])
+        return nodes + containers
+
+    def get_nodes_info(self, nodes: list) -> dict:
+        # cached API lookups only, the scene is only listed for names that don't resolve to a single node
+        info = {}
+        unresolved = []
+        for node in nodes:
+            node_object = NODE_HANDLE_CACHE.get_node(node)
+            if node_object is None:
+                unresolved.append(node)
+                continue
+
+            dependency_node = OpenMaya.MFnDependencyNode(node_object)
+            node_info = {"matches": 1, "locked": [], "constrained": [], "connected": []}
+            for channel in CHANNEL_NAMES:
+                try:
+                    plug = dependency_node.findPlug(channel, False)
+                except RuntimeError:
+                    continue
+                if plug.isLocked:
+                    node_info["locked"].append(channel)
+                if plug.isDestination:
+                    if plug.source().node().hasFn(OpenMaya.MFn.kConstraint):
+                        node_info["constrained"].append(channel)
+                    else:
+                        node_info["connected"].append(channel)
+            info[node] = node_info
+
+        for node, matches in self.count_matches(unresolved).items():
+            info[node] = {"matches": matches, "locked": [], "constrained": [], "connected": []}
+        return info
+
+    @staticmethod
+    def count_matches(nodes: list) -> dict:
+        # a single ls for every name, its long names are dispatched back by short name
+        if len(nodes) == 0:
+            return {}
+
+        matches_by_short_name = {}
+        for match in cmds.ls(nodes, long=True) or []:
+            matches_by_short_name.setdefault(match.rsplit("|", 1)[-1], []).append(match)
+
+        counts = {}
+        for node in nodes:
+            path = "|" + node.lstrip("|")
+            counts[node] = sum(1 for match in matches_by_short_name.get(node.rsplit("|", 1)[-1], [])
+                               if match == node or match.endswith(path))
+        return counts
+
+    def get_constraints(self, targets: list) -> list:
+        # one pass over the channel plugs of every target, drivers are read from the constraint target arrays
+        constraints = OrderedDict()
+        for target in targets:
+            node = NODE_HANDLE_CACHE.get_node(target)
+            if node is None:
+                continue
+
+            dependency_node = OpenMaya.MFnDependencyNode(node)
+            for channel in CHANNEL_NAMES:
+                try:
+                    plug = dependency_node.findPlug(channel, False)
+                except RuntimeError:
+                    continue
+                if not plug.isDestination:
+                    continue
+                constraint_node = plug.source().node()
+                if not constraint_node.hasFn(OpenMaya.MFn.kConstraint):
+                    continue
+
+                name = OpenMaya.MDagPath.getAPathTo(constraint_node).partialPathName()
+                constraint = constraints.get(name)
+                if constraint is None:
+                    constrain_enum = CONSTRAIN_TYPES.get(OpenMaya.MFnDependencyNode(constraint_node).typeName)
+                    if constrain_enum is None:
+                        continue
+                    constraint = constraints[name] = {
+                        "name": name,
+                        "type": constrain_enum,
+                        "target": target,
+                        "sources": self._get_constraint_sources(constraint_node),
+                        "channels": set()
+                    }
+                constraint["channels"].add(channel)
+
+        for constraint in constraints.values():
+            # parent constraints share their skip axes between translate and rotate
+            channel = CONSTRAIN_CHANNELS[constraint["type"]][0]
+            constraint["skip"] = tuple(channel + axe not in constraint["channels"] for axe in AXES_NAMES)
+            del constraint["channels"]
+        return list(constraints.values())
+
+    @staticmethod
+    def _get_constraint_sources(constraint_node) -> list:
+        dependency_node = OpenMaya.MFnDependencyNode(constraint_node)
+        targets_plug = dependency_node.findPlug("target", False)
+        parent_matrix_attribute = dependency_node.attribute("targetParentMatrix")
+        sources = []
+        for i in range(targets_plug.numElements()):
+            parent_matrix_plug = targets_plug.elementByPhysicalIndex(i).child(parent_matrix_attribute)
+            if parent_matrix_plug.isDestination:
+                sources.append(OpenMaya.MDagPath.getAPathTo(parent_matrix_plug.source().node()).partialPathName())
+        return sources
+
+    def get_canonical_names(self, nodes: list) -> dict:
+        canonical_names = {}
+        for node in nodes:
+            dag_path = NODE_HANDLE_CACHE.get_dag_path(node)
+            canonical_names[node] = dag_path.partialPathName() if dag_path is not None else node
+        return canonical_names
+
+    @staticmethod
+    def get_skip_flags(constrain_enum: ConstrainEnum, skip_axes: tuple) -> str:
+        if constrain_enum == ConstrainEnum.PARENT_CONSTRAIN:
+            skip_flags = ["-skipTranslate", "-skipRotate"]
+        else:
+            skip_flags = ["-skip"]
+
+        flags = ""
+        for axe, skip in zip(AXES_NAMES, skip_axes):
+            if skip:
+                for flag in skip_flags:
+                    flags += " {} {}".format(flag, axe)
+        return flags
+
+
+class InMemoryConstraintBackend(ConstraintBackend):
+    # fake scene used to exercise plans and appliers without a Maya session
+
+    def __init__(self, nodes=None, locked: dict = None, connected: dict = None):
+        self.nodes = set(nodes) if nodes is not None else None
+        self.locked = locked if locked is not None else {}
+        self.connected = connected if connected is not None else {}
+        self.constraints = []
+        self.bakedAttributes = []
+        self.registry = {}
+        self.undoChunks = []
+        self.cancelledChunks = []
+        self._openChunk = None
+        self._chunkState = None
+        self._createdCount = 0
+
+    def open_undo_chunk(self, name: str):
+        self._openChunk = name
+        self._chunkState = (list(self.constraints), {scope: list(nodes) for scope, nodes in self.registry.items()},
+                            list(self.bakedAttributes))
+
+    def close_undo_chunk(self):
+        self.undoChunks.append(self._openChunk)
+        self._openChunk = None
+
+    def cancel_undo_chunk(self) -> bool:
+        self.constraints, self.registry, self.bakedAttributes = self._chunkState
+        self.cancelledChunks.append(self._openChunk)
+        self._openChunk = None
+        return True
+
+    def create_constraints(self, constrain_enum: ConstrainEnum, skip_axes: tuple, pairs: list) -> list:
+        node_type = CONSTRAIN_COMMANDS[constrain_enum]
+        created = []
+        for source, target in pairs:
+            if self.nodes is not None and (source not in self.nodes or target not in self.nodes):
+                raise ValueError("No object matches name: {} / {}".format(source, target))
+            self._createdCount += 1
+            name = "{}_{}{}".format(target, node_type, self._createdCount)
+            self.constraints.append({
+                "name": name,
+                "type": node_type,
+                "source": source,
+                "target": target,
+                "skip": skip_axes
+            })
+            created.append(name)
+        return created
+
+    def bake(self, attributes: list, start: float, end: float):
+        self.bakedAttributes.append((list(attributes), start, end))
+
+    def delete_nodes(self, nodes: list):
+        nodes = set(nodes)
+        self.constraints = [constraint for constraint in self.constraints if constraint["name"] not in nodes]
+        for scope in list(self.registry.keys()):
+            self.registry[scope] = [node for node in self.registry[scope] if node not in nodes]
+            if len(self.registry[scope]) == 0:
+                self.registry.pop(scope)
+
+    def register_nodes(self, nodes: list, scope: str):
+        if len(nodes) > 0:
+            self.registry.setdefault(self.get_scope_name(scope), []).extend(nodes)
+
+    def get_registered_nodes(self, scope: str = None) -> list:
+        if scope is None:
+            return [node for nodes in self.registry.values() for node in nodes]
+        return list(self.registry.get(self.get_scope_name(scope), []))
+
+    def get_nodes_info(self, nodes: list) -> dict:
+        constrained = {}
+        for constraint in self.constraints:
+            constrain_enum = CONSTRAIN_TYPES[constraint["type"]]
+            channels = constrained.setdefault(constraint["target"], set())
+            for channel in CONSTRAIN_CHANNELS[constrain_enum]:
+                channels.update(channel + axe for axe, skip in zip(AXES_NAMES, constraint["skip"]) if not skip)
+
+        return {node: {
+            "matches": 1 if self.nodes is None or node in self.nodes else 0,
+            "locked": sorted(self.locked.get(node, [])),
+            "constrained": sorted(constrained.get(node, [])),
+            "connected": sorted(self.connected.get(node, []))
+        } for node in nodes}
+
+    def get_constraints(self, targets: list) -> list:
+        targets = set(targets)
+        return [{
+            "name": constraint["name"],
+            "type": CONSTRAIN_TYPES[constraint["type"]],
+            "target": constraint["target"],
+            "sources": [constraint["source"]],
+            "skip": tuple(constraint["skip"])
+        } for constraint in self.constraints if constraint["target"] in targets]
+
+    def get_canonical_names(self, nodes: list) -> dict:
+        return {node: node for node in nodes}
+
+
+class MappingValidator(object):
+    # pre-flight checks of a plan against the scene, every name is resolved once before anything is changed
+
+    def __init__(self, backend: ConstraintBackend):
+        self.backend = backend
+
+    def validate(self, plan: ConstraintApplyPlan) -> dict:
+        report = {"valid": True, "errors": [], "warnings": []}
+        pairs = [pair for group_pairs in plan.groups.values() for pair in group_pairs]
+        names = sorted({name for pair in pairs for name in pair})
+        nodes_info = self.backend.get_nodes_info(names)
+
+        for name in names:
+            matches = nodes_info[name]["matches"]
+            if matches == 0:
+                self._add_issue(report, "errors", "missing", name, "{} doesn't exist".format(name))
+            elif matches > 1:
+                self._add_issue(report, "errors", "ambiguous", name,
+                                "{} matches {} nodes".format(name, matches))
+
+        drivers = {}
+        for (constrain_enum, skip_axes), group_pairs in plan.groups.items():
+            channels = [channel + axe for channel in CONSTRAIN_CHANNELS[constrain_enum]
+                        for axe, skip in zip(AXES_NAMES, skip_axes) if not skip]
+            for source, target in group_pairs:
+                if source == target:
+                    self._add_issue(report, "errors", "selfConstrained", target,
+                                    "{} is constrained to itself".format(target))
+                for channel in channels:
+                    drivers.setdefault((target, channel), []).append(source)
+
+        for (target, channel), sources in sorted(drivers.items()):
+            target_info = nodes_info[target]
+            plug = "{}.{}".format(target, channel)
+            if channel in target_info["locked"]:
+                self._add_issue(report, "errors", "locked", plug,
+                                "{} is locked, skip its axis or unlock it".format(plug))
+            if len(set(sources)) > 1:
+                self._add_issue(report, "errors", "duplicateTarget", plug,
+                                "{} would be driven by {}".format(plug, ", ".join(sorted(set(sources)))))
+            elif len(sources) > 1:
+                self._add_issue(report, "warnings", "overlappingConstraints", plug,
+                                "{} is driven by more than one constraint of {}".format(plug, sources[0]))
+            if channel in target_info["constrained"]:
+                self._add_issue(report, "warnings", "alreadyConstrained", plug,
+                                "{} is already constrained".format(plug))
+            elif channel in target_info["connected"]:
+                self._add_issue(report, "warnings", "connected", plug,
+                                "{} already has an incoming connection".format(plug))
+
+        report["valid"] = len(report["errors"]) == 0
+        return report
+
+    @staticmethod
+    def _add_issue(report: dict, severity: str, kind: str, name: str, message: str):
+        report[severity].append({"type": kind, "name": name, "message": message})
+
+    @staticmethod
+    def print_report(report: dict, limit: int = 20):
+        for severity in ("errors", "warnings"):
+            issues = report[severity]
+            for issue in issues[:limit]:
+                print("++++ {}: {} ++++".format(severity[:-1], issue["message"]))
+            if len(issues) > limit:
+                print("++++ ... {} more {} ++++".format(len(issues) - limit, severity))
+
+
+class ApplyProgress(object):
+    # progress of a long apply, also the way to cancel it. The base class reports nothing and never cancels
+
+    def begin(self, total: int, status: str):
+        return
+
+    def step(self, amount: int):
+        return
+
+    def is_cancelled(self) -> bool:
+        return False
+
+    def end(self):
+        return
+
+
+class MayaApplyProgress(ApplyProgress):
+    # Maya's main progress bar, ESC cancels
+
+    def __init__(self):
+        self.progressBar = pymel.mel.eval("$cmtProgressBar = $gMainProgressBar")
+
+    def begin(self, total: int, status: str):
+        pymel.progressBar(self.progressBar, edit=True, beginProgress=True, isInterruptable=True, status=status,
+                          maxValue=max(1, total))
+
+    def step(self, amount: int):
+        pymel.progressBar(self.progressBar, edit=True, step=amount)
+
+    def is_cancelled(self) -> bool:
+        return pymel.progressBar(self.progressBar, query=True, isCancelled=True)
+
+    def end(self):
+        pymel.progressBar(self.progressBar, edit=True, endProgress=True)
+
+
+class InMemoryApplyProgress(ApplyProgress):
+    # records the steps and cancels once cancel_after items are done, None never cancels
+
+    def __init__(self, cancel_after: int = None):
+        self.cancelAfter = cancel_after
+        self.total = 0
+        self.done = 0
+        self.steps = []
+        self.ended = False
+
+    def begin(self, total: int, status: str):
+        self.total = total
+
+    def step(self, amount: int):
+        self.done += amount
+        self.steps.append(amount)
+
+    def is_cancelled(self) -> bool:
+        return self.cancelAfter is not None and self.done >= self.cancelAfter
+
+    def end(self):
+        self.ended = True
+
+
+class BatchConstraintApplier(object):
+    undoChunkName = "ConstraintsMatchingApply"
+    # pairs sent to the backend at once, the progress bar and ESC are only checked between chunks
+    chunkSize = 200
+
+    def __init__(self, backend: ConstraintBackend, progress: ApplyProgress = None, chunk_size: int = None):
+        self.backend = backend
+        self.progress = progress if progress is not None else ApplyProgress()
+        if chunk_size is not None:
+            self.chunkSize = max(1, chunk_size)
+
+    def apply(self, plan: ConstraintApplyPlan, scope: str = "", validate: bool = True) -> dict:
+        summary = self._get_empty_summary(plan)
+        if plan.is_empty() or (validate and not self._validate(plan, summary)):
+            return summary
+
+        self.backend.open_undo_chunk(self.undoChunkName)
+        try:
+            if not self._create_constraints(plan, summary):
+                self._roll_back(summary)
+                return summary
+            self._register_nodes(plan, summary["nodes"], scope)
+        except Exception:
+            self._roll_back(summary)
+            raise
+        self.backend.close_undo_chunk()
+
+        return summary
+
+    def reapply(self, plan: ConstraintApplyPlan, scope: str = "", validate: bool = True) -> dict:
+        # the constraints already driving the targets are read once and diffed against the plan. Matching ones are
+        # kept, every other constraint registered under the plan's scopes is deleted (changed rows, cleared targets,
+        # unchecked constraints) and only the missing ones are created. Constraints the tool didn't create, or
+        # created for another scope, are never deleted
+        summary = self._get_empty_summary(plan)
+        summary["deleted"] = 0
+        summary["unchanged"] = 0
+        targets = sorted({target for pairs in plan.groups.values() for source, target in pairs})
+        sources = sorted({source for pairs in plan.groups.values() for source, target in pairs})
+        canonical_names = self.backend.get_canonical_names(sources)
+        existing = {}
+        for constraint in self.backend.get_constraints(targets):
+            existing.setdefault((constraint["target"], constraint["type"]), []).append(constraint)
+
+        changes = ConstraintApplyPlan()
+        changes.rowsCount = plan.rowsCount
+        changes.skippedRows = plan.skippedRows
+        changes.targetScopes = plan.targetScopes
+        kept = set()
+        for (constrain_enum, skip_axes), pairs in plan.groups.items():
+            for source, target in pairs:
+                match = None
+                for constraint in existing.get((target, constrain_enum), []):
+                    if constraint["sources"] == [canonical_names[source]] and constraint["skip"] == skip_axes:
+                        match = constraint
+                        break
+                if match is None:
+                    changes.add((constrain_enum, skip_axes), source, target)
+                else:
+                    kept.add(match["name"])
+                    summary["unchanged"] += 1
+
+        # registry containers are left in place, they are reused by the next apply
+        registered = []
+        for registry_scope in sorted({scope} | set(plan.targetScopes.values())):
+            registered.extend(self.backend.get_registered_nodes(registry_scope))
+        stale = [node for node in registered if not node.startswith(REGISTRY_SET_NAME) and node not in kept]
+        summary["groups"] = len(changes.groups)
+        if len(stale) == 0 and changes.is_empty():
+            return summary
+        if not changes.is_empty() and validate and not self._validate(changes, summary):
+            return summary
+
+        self.backend.open_undo_chunk(self.undoChunkName)
+        try:
+            # stale nodes go first, a new constraint of the same type would otherwise be merged into them
+            self.backend.delete_nodes(stale)
+            summary["deleted"] = len(stale)
+            if not self._create_constraints(changes, summary):
+                self._roll_back(summary)
+                return summary
+            self._register_nodes(changes, summary["nodes"], scope)
+        except Exception:
+            self._roll_back(summary)
+            raise
+        self.backend.close_undo_chunk()
+        return summary
+
+    def delete_created(self, scope: str = None) -> int:
+        # only the nodes registered at apply time, in a single delete
+        nodes = self.backend.get_registered_nodes(scope)
+        if len(nodes) == 0:
+            return 0
+
+        self.backend.open_undo_chunk(self.undoChunkName)
+        try:
+            self.backend.delete_nodes(nodes)
+        finally:
+            self.backend.close_undo_chunk()
+        return len(nodes)
+
+    def apply_and_bake(self, plan: ConstraintApplyPlan, start: float, end: float, validate: bool = True) -> dict:
+        # constraints only live for the bake, the scene ends with keys and without any of the created nodes
+        summary = self._get_empty_summary(plan)
+        if plan.is_empty() or (validate and not self._validate(plan, summary)):
+            return summary
+
+        self.backend.open_undo_chunk(self.undoChunkName)
+        try:
+            if not self._create_constraints(plan, summary):
+                self._roll_back(summary)
+                return summary
+            attributes = plan.get_driven_attributes()
+            self.backend.bake(attributes, start, end)
+            self.backend.delete_nodes(summary["nodes"])
+            summary["baked"] = len(attributes)
+            summary["deleted"] = len(summary["nodes"])
+            summary["nodes"] = []
+        except Exception:
+            self._roll_back(summary)
+            raise
+        self.backend.close_undo_chunk()
+
+        return summary
+
+    def _validate(self, plan: ConstraintApplyPlan, summary: dict) -> bool:
+        summary["validation"] = MappingValidator(self.backend).validate(plan)
+        return summary["validation"]["valid"]
+
+    def _create_constraints(self, plan: ConstraintApplyPlan, summary: dict) -> bool:
+        # False when cancelled, the caller then rolls the undo chunk back
+        self.progress.begin(plan.get_constraints_count(), "Applying constraints")
+        try:
+            for (constrain_enum, skip_axes), pairs in plan.groups.items():
+                node_type = CONSTRAIN_COMMANDS[constrain_enum]
+                for start in range(0, len(pairs), self.chunkSize):
+                    chunk = pairs[start:start + self.chunkSize]
+                    created = self.backend.create_constraints(constrain_enum, skip_axes, chunk)
+                    summary["created"][node_type] = summary["created"].get(node_type, 0) + len(created)
+                    summary["nodes"].extend(created)
+                    self.progress.step(len(chunk))
+                    if self.progress.is_cancelled():
+                        summary["cancelled"] = True
+                        return False
+        finally:
+            self.progress.end()
+        return True
+
+    def _register_nodes(self, plan: ConstraintApplyPlan, nodes: list, scope: str):
+        # the backends create one node per pair, in the plan's order
+        if len(plan.targetScopes) == 0:
+            self.backend.register_nodes(nodes, scope)
+            return
+
+        targets = [target for pairs in plan.groups.values() for source, target in pairs]
+        nodes_by_scope = OrderedDict()
+        for node, target in zip(nodes, targets):
+            nodes_by_scope.setdefault(plan.targetScopes.get(target, scope), []).append(node)
+        for registry_scope, scope_nodes in nodes_by_scope.items():
+            self.backend.register_nodes(scope_nodes, registry_scope)
+
+    def _roll_back(self, summary: dict):
+        # the whole undo chunk is reverted: nodes created by a command that failed halfway are removed and stale
+        # nodes deleted by reapply come back, the scene is left as it was and undo has nothing to revert. With
+        # undo disabled only the nodes the backend returned can be deleted
+        summary["rolledBack"] = len(summary["nodes"])
+        if self.backend.cancel_undo_chunk():
+            if "deleted" in summary:
+                summary["deleted"] = 0
+        else:
+            self.backend.delete_nodes(summary["nodes"])
+            self.backend.close_undo_chunk()
+        summary["created"] = {}
+        summary["nodes"] = []
+
+    @staticmethod
+    def _get_empty_summary(plan: ConstraintApplyPlan) -> dict:
+        return {
+            "rows": plan.rowsCount,
+            "skippedRows": len(plan.skippedRows),
+            "groups": len(plan.groups),
+            "created": {},
+            "nodes": []
+        }
+
+
+class AnimCurveData(object):
+    # keys of one animation curve, times in ui time units, values and tangent angles (radians) in internal units
+    __slots__ = ("times", "values", "inTangentTypes", "outTangentTypes", "inAngles", "inWeights",
+                 "outAngles", "outWeights", "weighted")
+
+    def __init__(self, times: list, values: list, in_tangent_types: list = None, out_tangent_types: list = None,
+                 in_angles: list = None, in_weights: list = None, out_angles: list = None,
+                 out_weights: list = None, weighted: bool = False):
+        keys_count = len(times)
+        self.times = list(times)
+        self.values = list(values)
+        self.inTangentTypes = in_tangent_types if in_tangent_types is not None else [None] * keys_count
+        self.outTangentTypes = out_tangent_types if out_tangent_types is not None else [None] * keys_count
+        self.inAngles = in_angles if in_angles is not None else [0.0] * keys_count
+        self.inWeights = in_weights if in_weights is not None else [1.0] * keys_count
+        self.outAngles = out_angles if out_angles is not None else [0.0] * keys_count
+        self.outWeights = out_weights if out_weights is not None else [1.0] * keys_count
+        self.weighted = weighted
+
+    def __len__(self):
+        return len(self.times)
+
+    def retimed(self, offset: float = 0.0, scale: float = 1.0) -> "AnimCurveData":
+        if scale <= 0.0:
+            raise ValueError("time scale must be positive, got {}".format(scale))
+        if offset == 0.0 and scale == 1.0:
+            return self
+
+        # slopes are value / time, so stretching the time flattens the tangents by the same factor
+        def retime_angle(angle):
+            return math.atan(math.tan(angle) / scale)
+
+        return AnimCurveData(
+            [time * scale + offset for time in self.times],
+            self.values,
+            self.inTangentTypes,
+            self.outTangentTypes,
+            [retime_angle(angle) for angle in self.inAngles],
+            [weight * scale for weight in self.inWeights] if self.weighted else self.inWeights,
+            [retime_angle(angle) for angle in self.outAngles],
+            [weight * scale for weight in self.outWeights] if self.weighted else self.outWeights,
+            self.weighted
+        )
+
+
+class AnimCurveBackend(ABC):
+
+    @abstractmethod
+    def read_curves(self, plugs: list) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_curves(self, curves: dict):
+        raise NotImplementedError
+
+
+class MayaAnimCurveBackend(AnimCurveBackend):
+    # reads and writes keys through MFnAnimCurve. Writes go through the plug-in's undoable command so Ctrl+Z
+    # reverts them, it takes the curves from _pendingCurves. Without the plug-in (the module imported by a script)
+    # the API changes are kept for undo()
+    _pendingCurves = None
+
+    def __init__(self):
+        self.dgModifier = OpenMaya.MDGModifier()
+        self.animCurveChange = OpenMayaAnim.MAnimCurveChange()
+
+    @staticmethod
+    def get_plugs(plugs: list) -> list:
+        return [NODE_HANDLE_CACHE.get_plug(plug) for plug in plugs]
+
+    def read_curves(self, plugs: list) -> dict:
+        curves = {}
+        time_unit = OpenMaya.MTime.uiUnit()
+        for name, plug in zip(plugs, self.get_plugs(plugs)):
+            animation = OpenMayaAnim.MAnimUtil.findAnimation(plug)
+            if len(animation) == 0 or not animation[0].hasFn(OpenMaya.MFn.kAnimCurve):
+                continue
+
+            curve_fn = OpenMayaAnim.MFnAnimCurve(animation[0])
+            keys = range(curve_fn.numKeys)
+            in_tangents = [curve_fn.getTangentAngleWeight(i, True) for i in keys]
+            out_tangents = [curve_fn.getTangentAngleWeight(i, False) for i in keys]
+            curves[name] = AnimCurveData(
+                [curve_fn.input(i).asUnits(time_unit) for i in keys],
+                [curve_fn.value(i) for i in keys],
+                [curve_fn.inTangentType(i) for i in keys],
+                [curve_fn.outTangentType(i) for i in keys],
+                [angle.asRadians() for angle, weight in in_tangents],
+                [weight for angle, weight in in_tangents],
+                [angle.asRadians() for angle, weight in out_tangents],
+                [weight for angle, weight in out_tangents],
+                curve_fn.isWeighted
+            )
+        return curves
+
+    def write_curves(self, curves: dict):
+        if not cmds.exists(WRITE_CURVES_COMMAND):
+            self.apply_curves(curves, self.dgModifier, self.animCurveChange)
+            return
+
+        # commands only take flags and strings, the curves are handed over through the class
+        MayaAnimCurveBackend._pendingCurves = curves
+        try:
+            getattr(cmds, WRITE_CURVES_COMMAND)()
+        finally:
+            MayaAnimCurveBackend._pendingCurves = None
+
+    @classmethod
+    def apply_curves(cls, curves: dict, dg_modifier, anim_curve_change):
+        # existing keys of the written curves are replaced, every change is recorded for undo
+        plug_names = list(curves.keys())
+        curve_fns = []
+        for plug in cls.get_plugs(plug_names):
+            animation = OpenMayaAnim.MAnimUtil.findAnimation(plug)
+            curve_fn = OpenMayaAnim.MFnAnimCurve()
+            if len(animation) > 0 and animation[0].hasFn(OpenMaya.MFn.kAnimCurve):
+                curve_fn.setObject(animation[0])
+            else:
+                curve_fn.create(plug, modifier=dg_modifier)
+            curve_fns.append(curve_fn)
+        dg_modifier.doIt()
+
+        time_unit = OpenMaya.MTime.uiUnit()
+        for name, curve_fn in zip(plug_names, curve_fns):
+            data = curves[name]
+            times = OpenMaya.MTimeArray([OpenMaya.MTime(time, time_unit) for time in data.times])
+            curve_fn.addKeys(times, OpenMaya.MDoubleArray(data.values), keepExistingKeys=False,
+                             change=anim_curve_change)
+            curve_fn.setIsWeighted(data.weighted, anim_curve_change)
+            for time, in_type, out_type, in_angle, in_weight, out_angle, out_weight in zip(
+                    times, data.inTangentTypes, data.outTangentTypes, data.inAngles, data.inWeights,
+                    data.outAngles, data.outWeights):
+                index = curve_fn.find(time)
+                if in_type is not None:
+                    curve_fn.setInTangentType(index, in_type, anim_curve_change)
+                if out_type is not None:
+                    curve_fn.setOutTangentType(index, out_type, anim_curve_change)
+                curve_fn.setTangent(index, OpenMaya.MAngle(in_angle), in_weight, True, anim_curve_change)
+                curve_fn.setTangent(index, OpenMaya.MAngle(out_angle), out_weight, False, anim_curve_change)
+
+    def undo(self):
+        self.animCurveChange.undoIt()
+        self.dgModifier.undoIt()
+
+
+class InMemoryAnimCurveBackend(AnimCurveBackend):
+
+    def __init__(self, curves: dict = None):
+        self.curves = curves if curves is not None else {}
+
+    def read_curves(self, plugs: list) -> dict:
+        return {plug: self.curves[plug] for plug in plugs if plug in self.curves}
+
+    def write_curves(self, curves: dict):
+        self.curves.update(curves)
+
+
+class AnimationCopier(object):
+    # copies the keys of the channels each row would constrain, straight from curve to curve
+
+    def __init__(self, backend: AnimCurveBackend):
+        self.backend = backend
+
+    @staticmethod
+    def get_plug_pairs(plan: ConstraintApplyPlan) -> list:
+        pairs = {}
+        for (constrain_enum, skip_axes), rows in plan.groups.items():
+            for channel in CONSTRAIN_CHANNELS[constrain_enum]:
+                for axe, skip in zip(AXES_NAMES, skip_axes):
+                    if skip:
+                        continue
+                    attribute = channel + axe
+                    for source, target in rows:
+                        pairs["{}.{}".format(target, attribute)] = "{}.{}".format(source, attribute)
+        return [(source_plug, target_plug) for target_plug, source_plug in sorted(pairs.items())]
+
+    def copy(self, plan: ConstraintApplyPlan, offset: float = 0.0, scale: float = 1.0) -> dict:
+        plug_pairs = self.get_plug_pairs(plan)
+        source_curves = self.backend.read_curves(sorted({source_plug for source_plug, target_plug in plug_pairs}))
+
+        target_curves = {}
+        retimed_curves = {}
+        missing = []
+        for source_plug, target_plug in plug_pairs:
+            if source_plug not in source_curves:
+                missing.append(source_plug)
+                continue
+            if source_plug not in retimed_curves:
+                retimed_curves[source_plug] = source_curves[source_plug].retimed(offset, scale)
+            target_curves[target_plug] = retimed_curves[source_plug]
+
+        self.backend.write_curves(target_curves)
+        return {
+            "curves": len(target_curves),
+            "keys": sum(len(curve) for curve in target_curves.values()),
+            "missing": missing
+        }
+
+
+class MatrixSampler(ABC):
+
+    @abstractmethod
+    def get_parents(self, nodes: list) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def sample(self, nodes: list, frames: list, attribute: str):
+        # (frames, nodes, 4, 4) array of "worldMatrix" or "parentMatrix" values
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_rotate_settings(self, nodes: list) -> tuple:
+        # ([rotateOrder enum value], (nodes, 3) array of jointOrient radians, zeros for non joints)
+        raise NotImplementedError
+
+
+class MayaMatrixSampler(MatrixSampler):
+
+    def get_parents(self, nodes: list) -> list:
+        parents = []
+        for node in nodes:
+            parent = pymel.listRelatives(node, parent=True)
+            parents.append(parent[0].name() if len(parent) > 0 else "")
+        return parents
+
+    def get_rotate_settings(self, nodes: list) -> tuple:
+        rotate_orders = []
+        joint_orients = numpy.zeros((len(nodes), 3))
+        for j, node in enumerate(nodes):
+            rotate_orders.append(pymel.getAttr("{}.rotateOrder".format(node)))
+            if pymel.attributeQuery("jointOrient", node=node, exists=True):
+                joint_orients[j] = numpy.radians(pymel.getAttr("{}.jointOrient".format(node)))
+        return rotate_orders, joint_orients
+
+    def sample(self, nodes: list, frames: list, attribute: str):
+        plugs = MayaAnimCurveBackend.get_plugs(["{}.{}[0]".format(node, attribute) for node in nodes])
+        matrices = numpy.empty((len(frames), len(nodes), 4, 4))
+        time_unit = OpenMaya.MTime.uiUnit()
+        for f, frame in enumerate(frames):
+            context = OpenMaya.MDGContext(OpenMaya.MTime(frame, time_unit))
+            for j, plug in enumerate(plugs):
+                matrix = OpenMaya.MFnMatrixData(plug.asMObject(context)).matrix()
+                matrices[f, j] = numpy.reshape(list(matrix), (4, 4))
+        return matrices
+
+
+class InMemoryMatrixSampler(MatrixSampler):
+    # world matrices per node and frame, parent matrices are taken from the parent's world matrix. Rotate orders
+    # default to xyz and joint orients (radians) to zero
+
+    def __init__(self, world_matrices: dict, parents: dict = None, rotate_orders: dict = None,
+                 joint_orients: dict = None):
+        self.worldMatrices = world_matrices
+        self.parents = parents if parents is not None else {}
+        self.rotateOrders = rotate_orders if rotate_orders is not None else {}
+        self.jointOrients = joint_orients if joint_orients is not None else {}
+
+    def get_parents(self, nodes: list) -> list:
+        return [self.parents.get(node, "") for node in nodes]
+
+    def get_rotate_settings(self, nodes: list) -> tuple:
+        return ([self.rotateOrders.get(node, 0) for node in nodes],
+                numpy.array([self.jointOrients.get(node, (0.0, 0.0, 0.0)) for node in nodes], dtype=float))
+
+    def sample(self, nodes: list, frames: list, attribute: str):
+        matrices = numpy.empty((len(frames), len(nodes), 4, 4))
+        for j, node in enumerate(nodes):
+            if attribute == "parentMatrix":
+                node = self.parents.get(node, "")
+            for f, frame in enumerate(frames):
+                matrices[f, j] = self.worldMatrices[node][frame] if node != "" else numpy.identity(4)
+        return matrices
+
+
+class RetargetSolver(object):
+    # maintainOffset retargeting for every joint at once, matrices use Maya's row vector convention
+    # (world = local * parentWorld). Targets flagged in point_targets follow pointConstraint -mo instead: their
+    # world position is the source's plus the constant world offset of the reference frame, the matrix offset
+    # only gives their rotation. channel_masks (joints, t/r/s, x/y/z) flags the written channels, the others keep
+    # their scene values when a target is the parent of another one
+
+    def __init__(self, source_reference, target_reference, target_parents: list = None, point_targets: list = None,
+                 channel_masks=None, rotate_orders: list = None, joint_orients=None):
+        self.offsets = target_reference @ numpy.linalg.inv(source_reference)
+        joints_count = self.offsets.shape[0]
+        self.targetParents = target_parents if target_parents is not None else [-1] * joints_count
+        self.levels = self._get_levels(self.targetParents)
+        self.pointTargets = numpy.zeros(joints_count, dtype=bool)
+        if point_targets is not None:
+            self.pointTargets[:] = point_targets
+        self.translateOffsets = target_reference[:, 3, :3] - source_reference[:, 3, :3]
+        self.channelMasks = numpy.ones((joints_count, 3, 3), dtype=bool) if channel_masks is None else \
+            numpy.asarray(channel_masks, dtype=bool)
+        self.rotateOrders = numpy.asarray(rotate_orders if rotate_orders is not None else [0] * joints_count)
+        self.jointOrients = numpy.zeros((joints_count, 3)) if joint_orients is None else numpy.asarray(joint_orients)
+
+    @staticmethod
+    def _get_levels(parents: list) -> list:
+        depths = [-1] * len(parents)
+        for j in range(len(parents)):
+            chain = []
+            current = j
+            while current != -1 and depths[current] == -1:
+                chain.append(current)
+                current = parents[current]
+            depth = depths[current] if current != -1 else -1
+            for node in reversed(chain):
+                depth += 1
+                depths[node] = depth
+
+        levels = [[] for i in range(max(depths) + 1 if depths else 0)]
+        for j, depth in enumerate(depths):
+            levels[depth].append(j)
+        return [numpy.asarray(level) for level in levels]
+
+    def solve_world(self, source_world):
+        world = self.offsets[None] @ source_world
+        if self.pointTargets.any():
+            world[:, self.pointTargets, 3, :3] = \
+                source_world[:, self.pointTargets, 3, :3] + self.translateOffsets[self.pointTargets]
+        return world
+
+    def solve_local(self, source_world, target_parent_world, target_world=None):
+        # targets parented under other targets are solved level by level under the world matrix their parent will
+        # have: solved values for its written channels, the sampled target_world values for the others
+        world = self.solve_world(source_world)
+        parent_world = numpy.array(target_parent_world, copy=True)
+        effective_world = numpy.array(world, copy=True)
+        local = numpy.empty_like(world)
+        parents = numpy.asarray(self.targetParents)
+        for depth, level in enumerate(self.levels):
+            if depth > 0:
+                parent_world[:, level] = effective_world[:, parents[level]]
+            local[:, level] = world[:, level] @ numpy.linalg.inv(parent_world[:, level])
+            if target_world is None or self.channelMasks[level].all():
+                continue
+
+            scene_local = target_world[:, level] @ numpy.linalg.inv(target_parent_world[:, level])
+            settings = (self.rotateOrders[level], self.jointOrients[level])
+            solved = self.decompose(local[:, level], *settings)
+            scene = self.decompose(scene_local, *settings)
+            masks = self.channelMasks[level]
+            mixed = [numpy.where(masks[:, i], solved[i], scene[i]) for i in range(3)]
+            effective_world[:, level] = self.compose(*mixed, *settings) @ parent_world[:, level]
+        return local
+
+    @staticmethod
+    def decompose(matrices, rotate_orders: list = None, joint_orients=None) -> tuple:
+        # local matrix = scale * rotate (in the joint's rotate order) * jointOrient, orders and orients are given
+        # per joint, the joints being the second last axis of the translations
+        translate = matrices[..., 3, :3]
+        scale = numpy.linalg.norm(matrices[..., :3, :3], axis=-1)
+        rotation = matrices[..., :3, :3] / numpy.where(scale == 0.0, 1.0, scale)[..., None]
+        if joint_orients is not None:
+            rotation = rotation @ numpy.swapaxes(RetargetSolver.get_rotation(joint_orients), -1, -2)
+
+        # the rotation is seen from the order's axes, where it reads as an xyz rotation. Odd permutations flip
+        # the handedness and the sign of the angles
+        orders = numpy.asarray(rotate_orders if rotate_orders is not None else [0] * translate.shape[-2])
+        axes = numpy.asarray(ROTATE_ORDERS)[orders]
+        joints = numpy.arange(len(orders))[:, None, None]
+        rotation = rotation[..., joints, axes[:, :, None], axes[:, None, :]]
+        angles = numpy.stack([
+            numpy.arctan2(rotation[..., 1, 2], rotation[..., 2, 2]),
+            numpy.arctan2(-rotation[..., 0, 2], numpy.hypot(rotation[..., 0, 0], rotation[..., 0, 1])),
+            numpy.arctan2(rotation[..., 0, 1], rotation[..., 0, 0])
+        ], axis=-1) * numpy.where(orders >= 3, -1.0, 1.0)[:, None]
+        rotate = numpy.empty_like(angles)
+        numpy.put_along_axis(rotate, numpy.broadcast_to(axes, angles.shape), angles, axis=-1)
+        return translate, rotate, scale
+
+    @staticmethod
+    def get_rotation(rotate, rotate_orders: list = None):
+        # (..., 3, 3) rotation matrices of euler angles in radians, xyz when no orders are given
+        cos = numpy.cos(rotate)
+        sin = numpy.sin(rotate)
+        shape = numpy.shape(rotate)[:-1]
+        axis_rotations = numpy.zeros(shape + (3, 3, 3))
+        axis_rotations[..., 0, 0, 0] = 1.0
+        axis_rotations[..., 0, 1, 1], axis_rotations[..., 0, 1, 2] = cos[..., 0], sin[..., 0]
+        axis_rotations[..., 0, 2, 1], axis_rotations[..., 0, 2, 2] = -sin[..., 0], cos[..., 0]
+        axis_rotations[..., 1, 1, 1] = 1.0
+        axis_rotations[..., 1, 0, 0], axis_rotations[..., 1, 0, 2] = cos[..., 1], -sin[..., 1]
+        axis_rotations[..., 1, 2, 0], axis_rotations[..., 1, 2, 2] = sin[..., 1], cos[..., 1]
+        axis_rotations[..., 2, 2, 2] = 1.0
+        axis_rotations[..., 2, 0, 0], axis_rotations[..., 2, 0, 1] = cos[..., 2], sin[..., 2]
+        axis_rotations[..., 2, 1, 0], axis_rotations[..., 2, 1, 1] = -sin[..., 2], cos[..., 2]
+        if rotate_orders is None:
+            return axis_rotations[..., 0, :, :] @ axis_rotations[..., 1, :, :] @ axis_rotations[..., 2, :, :]
+
+        axes = numpy.asarray(ROTATE_ORDERS)[numpy.asarray(rotate_orders)]
+        joints = numpy.arange(len(axes))
+        return axis_rotations[..., joints, axes[:, 0], :, :] @ axis_rotations[..., joints, axes[:, 1], :, :] @ \
+            axis_rotations[..., joints, axes[:, 2], :, :]
+
+    @staticmethod
+    def compose(translate, rotate, scale, rotate_orders: list = None, joint_orients=None):
+        shape = numpy.shape(translate)[:-1]
+        rotation = RetargetSolver.get_rotation(rotate, rotate_orders)
+        if joint_orients is not None:
+            rotation = rotation @ RetargetSolver.get_rotation(joint_orients)
+
+        matrices = numpy.zeros(shape + (4, 4))
+        matrices[..., :3, :3] = numpy.asarray(scale)[..., :, None] * rotation
+        matrices[..., 3, :3] = translate
+        matrices[..., 3, 3] = 1.0
+        return matrices
+
+
+class Retargeter(object):
+    # samples the rig in frame batches, solves them with RetargetSolver and writes the driven channels as curves
+    batchSize = 100
+
+    def __init__(self, sampler: MatrixSampler, curve_backend: AnimCurveBackend):
+        self.sampler = sampler
+        self.curveBackend = curve_backend
+
+    @staticmethod
+    def get_channel_masks(plan: ConstraintApplyPlan) -> dict:
+        # target -> (source, {channel: [x, y, z] written})
+        masks = {}
+        for (constrain_enum, skip_axes), pairs in plan.groups.items():
+            for source, target in pairs:
+                if target not in masks:
+                    masks[target] = (source, {"t": [False] * 3, "r": [False] * 3, "s": [False] * 3})
+                channels = masks[target][1]
+                for channel in CONSTRAIN_CHANNELS[constrain_enum]:
+                    for i, skip in enumerate(skip_axes):
+                        channels[channel][i] = channels[channel][i] or not skip
+        return masks
+
+    @staticmethod
+    def get_point_targets(plan: ConstraintApplyPlan) -> set:
+        # targets translated by a point row, a parent row on the same target takes precedence
+        point_targets = set()
+        parent_targets = set()
+        for (constrain_enum, skip_axes), pairs in plan.groups.items():
+            if constrain_enum == ConstrainEnum.POINT_CONSTRAIN:
+                point_targets.update(target for source, target in pairs)
+            elif constrain_enum == ConstrainEnum.PARENT_CONSTRAIN:
+                parent_targets.update(target for source, target in pairs)
+        return point_targets - parent_targets
+
+    def retarget(self, plan: ConstraintApplyPlan, frames: list, reference_frame: float) -> dict:
+        if not numpy.lazy_is_available():
+            raise ImportError("numpy is needed to retarget through the offset solver")
+
+        masks = self.get_channel_masks(plan)
+        targets = sorted(masks.keys())
+        sources = [masks[target][0] for target in targets]
+        target_indices = {target: j for j, target in enumerate(targets)}
+        target_parents = [target_indices.get(parent, -1) for parent in self.sampler.get_parents(targets)]
+        rotate_orders, joint_orients = self.sampler.get_rotate_settings(targets)
+        point_targets = self.get_point_targets(plan)
+
+        solver = RetargetSolver(
+            self.sampler.sample(sources, [reference_frame], "worldMatrix")[0],
+            self.sampler.sample(targets, [reference_frame], "worldMatrix")[0],
+            target_parents,
+            [target in point_targets for target in targets],
+            [[masks[target][1][channel] for channel in ("t", "r", "s")] for target in targets],
+            rotate_orders,
+            joint_orients
+        )
+
+        translates, rotates, scales = [], [], []
+        for start in range(0, len(frames), self.batchSize):
+            batch_frames = frames[start:start + self.batchSize]
+            local = solver.solve_local(
+                self.sampler.sample(sources, batch_frames, "worldMatrix"),
+                self.sampler.sample(targets, batch_frames, "parentMatrix"),
+                self.sampler.sample(targets, batch_frames, "worldMatrix")
+            )
+            translate, rotate, scale = RetargetSolver.decompose(local, rotate_orders, joint_orients)
+            translates.append(translate)
+            rotates.append(rotate)
+            scales.append(scale)
+
+        values = {
+            "t": numpy.concatenate(translates),
+            "r": numpy.concatenate(rotates),
+            "s": numpy.concatenate(scales)
+        }
+        # keeps rotations continuous across the +-pi wrap of arctan2
+        values["r"] = numpy.unwrap(values["r"], axis=0)
+
+        curves = {}
+        for j, target in enumerate(targets):
+            for channel, axes in masks[target][1].items():
+                for i, write in enumerate(axes):
+                    if write:
+                        curves["{}.{}{}".format(target, channel, AXES_NAMES[i])] = AnimCurveData(
+                            frames, values[channel][:, j, i].tolist())
+
+        self.curveBackend.write_curves(curves)
+        return {"targets": len(targets), "frames": len(frames), "curves": len(curves)}
+
+
+class MatchingRow(object):
+    __slots__ = ("source", "target", "constraints")
+
+    def __init__(self, source: str, target: str = "", constraints: dict = None):
+        self.source = source
+        self.target = target
+        self.constraints = constraints if constraints is not None else {}
+
+
+class MatchingModel(object):
+    # headless source x target mapping, the UI is only a view over it and batch scripts can drive it directly
+    maxTargetsPerSource = 2
+
+    def __init__(self, sources: list = None, name: str = ""):
+        self.rows = []
+        self._sourceRows = {}
+        self.name = name
+        if sources is not None:
+            self.set_sources(sources)
+
+    @classmethod
+    def from_lists(cls, sources: list, targets: list, constraints: list) -> "MatchingModel":
+        model = cls()
+        if len(sources) != len(targets) or len(targets) != len(constraints):
+            return model
+
+        for i in range(len(sources)):
+            model._append_row(MatchingRow(sources[i], targets[i], constraints[i]))
+        return model
+
+    @classmethod
+    def from_hierarchy(cls, root) -> "MatchingModel":
+        source_nodes = pymel.listRelatives(root, allDescendents=True)
+        sources = [source.name() for source in source_nodes]
+        sources.append(pymel.PyNode(root).name())
+        sources.reverse()
+        return cls(sources)
+
+    @classmethod
+    @PERFORMANCE_STATS.timed("json.load")
+    def from_json(cls, file_name) -> "MatchingModel":
+        model = cls()
+        try:
+            for rows, depths in cls.iter_json_batches(file_name):
+                for row in rows:
+                    model._append_row(row)
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            return None
+        return model
+
+    @staticmethod
+    def iter_json_batches(file_name, batch_size: int = 500, task: "BackgroundTask" = None):
+        # (rows, None) batches of a mapping file, rows are checked as they are read. Stops once the task is cancelled
+        rows = []
+        for source, target, constraints in JsonDataManager.iter_rows(file_name):
+            if not isinstance(source, str) or source == "" or not isinstance(target, str):
+                raise ValueError("invalid row in {}: {} / {}".format(file_name, source, target))
+            rows.append(MatchingRow(source, target, constraints))
+            if len(rows) == batch_size:
+                if task is not None and task.is_cancelled():
+                    return
+                yield rows, None
+                rows = []
+        if len(rows) > 0:
+            yield rows, None
+
+    @staticmethod
+    def iter_hierarchy_batches(root: str, root_path: str, names: list, paths: list, batch_size: int = 500,
+                               task: "BackgroundTask" = None):
+        # (rows, {source: depth}) batches in from_hierarchy order. names and paths are the two string lists of
+        # listRelatives, the only part that has to query the scene
+        root_depth = root_path.count("|")
+        sources = [root] + names[::-1]
+        source_paths = [root_path] + paths[::-1]
+        for start in range(0, len(sources), batch_size):
+            if task is not None and task.is_cancelled():
+                return
+            yield ([MatchingRow(source) for source in sources[start:start + batch_size]],
+                   {source: path.count("|") - root_depth for source, path in
+                    zip(sources[start:start + batch_size], source_paths[start:start + batch_size])})
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get_scope(self) -> str:
+        # created nodes are registered under this name, so they can be deleted per mapping
+        if self.name != "":
+            return self.name
+        if len(self.rows) == 0:
+            return ""
+        target_namespace = MappingTemplate.detect_namespace([target for target in self.get_targets() if target != ""])
+        return self.get_instance_scope(self.rows[0].source, target_namespace)
+
+    @staticmethod
+    def get_instance_scope(source_root: str, target_namespace: str) -> str:
+        # the full root name keeps its namespace and the target namespace is added, two characters never share
+        # a scope even when they share a rig or a source
+        return source_root + ">" + target_namespace if target_namespace != "" else source_root
+
+    def set_sources(self, sources: list):
+        self.clear()
+        for source in sources:
+            self._append_row(MatchingRow(source))
+
+    def clear(self):
+        self.rows = []
+        self._sourceRows = {}
+
+    def _append_row(self, row: MatchingRow):
+        self.rows.append(row)
+        self._sourceRows.setdefault(row.source, []).append(row)
+
+    def copy(self) -> "MatchingModel":
+        model = MatchingModel(name=self.name)
+        for row in self.rows:
+            constraints = {constrain_enum: Constrain.from_skip_mask(constrain_enum, constrain.get_skip_mask())
+                           for constrain_enum, constrain in row.constraints.items()}
+            model._append_row(MatchingRow(row.source, row.target, constraints))
+        return model
+
+    def get_row(self, index: int) -> MatchingRow:
+        return self.rows[index]
+
+    def get_sources(self) -> list:
+        return [row.source for row in self.rows]
+
+    def get_targets(self) -> list:
+        return [row.target for row in self.rows]
+
+    def get_constraints(self) -> list:
+        return [row.constraints for row in self.rows]
+
+    def get_targets_of(self, source: str) -> list:
+        return [row.target for row in self._sourceRows.get(source, [])]
+
+    def get_targets_count(self, source: str) -> int:
+        return len(self._sourceRows.get(source, []))
+
+    def has_source(self, source: str) -> bool:
+        return source in self._sourceRows
+
+    def add_target(self, index: int, target: str = "") -> int:
+        row = self.rows[index]
+        source_rows = self._sourceRows[row.source]
+        if len(source_rows) >= self.maxTargetsPerSource:
+            return -1
+
+        new_row = MatchingRow(row.source, target)
+        new_index = index + 1
+        self.rows.insert(new_index, new_row)
+        source_rows.insert(source_rows.index(row) + 1, new_row)
+        return new_index
+
+    def remove_target(self, index: int) -> bool:
+        row = self.rows[index]
+        source_rows = self._sourceRows[row.source]
+        if len(source_rows) <= 1:
+            return False
+
+        self.rows.pop(index)
+        source_rows.remove(row)
+        return True
+
+    def set_target(self, index: int, target: str):
+        self.rows[index].target = target
+
+    def map(self, source: str, target: str, constraints=()) -> int:
+        # fills the first empty target of the source, or adds a new row for it
+        source_rows = self._sourceRows.get(source)
+        if source_rows is None:
+            self._append_row(MatchingRow(source))
+            source_rows = self._sourceRows[source]
+
+        row = next((source_row for source_row in source_rows if source_row.target == ""), None)
+        if row is None:
+            index = self.add_target(self.rows.index(source_rows[-1]), target)
+            if index == -1:
+                return -1
+            row = self.rows[index]
+        row.target = target
+        for constrain in constraints:
+            if not isinstance(constrain, Constrain):
+                constrain = Constrain(constrain)
+            row.constraints[constrain.constrainEnum] = constrain
+        return self.rows.index(row)
+
+    def set_constraint(self, index: int, constrain_enum: ConstrainEnum, skip_axes: tuple = None) -> Constrain:
+        constraints = self.rows[index].constraints
+        if constrain_enum not in constraints:
+            constraints[constrain_enum] = Constrain(constrain_enum)
+        if skip_axes is not None:
+            constrain = constraints[constrain_enum]
+            constrain.skipX, constrain.skipY, constrain.skipZ = skip_axes
+        return constraints[constrain_enum]
+
+    def remove_constraint(self, index: int, constrain_enum: ConstrainEnum):
+        self.rows[index].constraints.pop(constrain_enum, None)
+
+    def find_rows(self, pattern: str = "", depth_range: tuple = None, source_depths: dict = None) -> list:
+        # row indices by source name and hierarchy depth range. Patterns with wildcards are matched against the
+        # whole name or the name without namespace, others are looked for anywhere in the name
+        if depth_range is not None and source_depths is None:
+            raise ValueError("find_rows needs source_depths to filter by depth_range")
+
+        pattern = pattern.lower()
+        use_glob = any(character in pattern for character in "*?[")
+        indices = []
+        for i, row in enumerate(self.rows):
+            source = row.source.lower()
+            if pattern != "" and not use_glob and pattern not in source:
+                continue
+            if use_glob and not (fnmatch.fnmatchcase(source, pattern) or
+                                 fnmatch.fnmatchcase(NameMatchingRule.split_name(source)[1], pattern)):
+                continue
+            if depth_range is not None:
+                depth = source_depths.get(row.source, -1)
+                if depth < depth_range[0] or depth > depth_range[1]:
+                    continue
+            indices.append(i)
+        return indices
+
+    def set_constraints(self, indices: list, constrain_enum: ConstrainEnum, skip_axes: tuple = None):
+        for index in indices:
+            self.set_constraint(index, constrain_enum, skip_axes)
+
+    def remove_constraints(self, indices: list, constrain_enum: ConstrainEnum = None):
+        # every constraint of the rows when no type is given
+        for index in indices:
+            if constrain_enum is None:
+                self.rows[index].constraints = {}
+            else:
+                self.rows[index].constraints.pop(constrain_enum, None)
+
+    def copy_constraints(self, from_index: int, indices: list):
+        # the rows end up with the same constraint types and skip axes as the copied row
+        constraints = self.rows[from_index].constraints
+        for index in indices:
+            if index != from_index:
+                self.rows[index].constraints = {
+                    constrain_enum: Constrain.from_skip_mask(constrain_enum, constrain.get_skip_mask())
+                    for constrain_enum, constrain in constraints.items()}
+
+    def update_skip_axe(self, index: int, constrain_enum: ConstrainEnum, skip_axe: str, value: bool):
+        constraints = self.rows[index].constraints
+        if constrain_enum in constraints:
+            constraints[constrain_enum].update_skip_axe(skip_axe, value)
+
+    def is_valid(self) -> bool:
+        if len(self.rows) == 0:
+            return False
+
+        for row in self.rows:
+            for key, value in row.constraints.items():
+                if not isinstance(key, ConstrainEnum) or not isinstance(value, Constrain):
+                    return False
+        return True
+
+    def get_apply_plan(self) -> ConstraintApplyPlan:
+        return ConstraintApplyPlan.from_rows(self.get_sources(), self.get_targets(), self.get_constraints())
+
+    def apply(self, backend: ConstraintBackend = None, progress: ApplyProgress = None,
+              chunk_size: int = None) -> dict:
+        if backend is None:
+            backend = MayaConstraintBackend()
+        return BatchConstraintApplier(backend, progress, chunk_size).apply(self.get_apply_plan(), self.get_scope())
+
+    def reapply(self, backend: ConstraintBackend = None, progress: ApplyProgress = None,
+                chunk_size: int = None) -> dict:
+        if backend is None:
+            backend = MayaConstraintBackend()
+        return BatchConstraintApplier(backend, progress, chunk_size).reapply(self.get_apply_plan(), self.get_scope())
+
+    def apply_to_namespaces(self, namespace_pairs: list, backend: ConstraintBackend = None,
+                            progress: ApplyProgress = None, chunk_size: int = None) -> dict:
+        return MappingTemplate(self).apply(namespace_pairs, backend, progress, chunk_size)
+
+    def validate(self, backend: ConstraintBackend = None) -> dict:
+        if backend is None:
+            backend = MayaConstraintBackend()
+        return MappingValidator(backend).validate(self.get_apply_plan())
+
+    def delete_created_constraints(self, this_mapping_only: bool = False, backend: ConstraintBackend = None) -> int:
+        if backend is None:
+            backend = MayaConstraintBackend()
+        scope = self.get_scope() if this_mapping_only else None
+        return BatchConstraintApplier(backend).delete_created(scope)
+
+    def auto_match(self, target_names: list, matcher: "NameMatcher", overwrite: bool = False,
+                   index: "TargetNameIndex" = None) -> int:
+        # a prebuilt index can be given instead of the names
+        if index is None:
+            index = TargetNameIndex(target_names)
+        matched = 0
+        for row, target in zip(self.rows, matcher.match(self.get_sources(), index)):
+            if target != "" and (overwrite or row.target == ""):
+                row.target = target
+                matched += 1
+        return matched
+
+    def topology_match(self, source_tree: "HierarchyTree", target_tree: "HierarchyTree",
+                       matcher: "TopologyMatcher" = None, min_confidence: float = 0.0,
+                       overwrite: bool = False) -> list:
+        # returns the confidence of every row, 0.0 for rows without a proposal
+        if matcher is None:
+            matcher = TopologyMatcher()
+        matches = matcher.match(source_tree, target_tree)
+        confidences = []
+        for row in self.rows:
+            target, confidence = matches.get(row.source, ("", 0.0))
+            if target != "" and confidence >= min_confidence and (overwrite or row.target == ""):
+                row.target = target
+            confidences.append(confidence)
+        return confidences
+
+    def mirror(self, source_mirrors: dict, target_mirrors: dict, axis_map: tuple = (0, 1, 2),
+               overwrite: bool = False) -> int:
+        # copies every row with constraints to the row of the mirrored source, with the mirrored target. Skip
+        # flags don't carry a sign, axis_map only matters when the other side's axes are permuted:
+        # mirrored skip axis i = skip axis axis_map[i]. Returns the number of rows written
+        written = set()
+        count = 0
+        for row in self.rows:
+            if id(row) in written or len(row.constraints) == 0:
+                continue
+            mirror_rows = self._sourceRows.get(source_mirrors.get(row.source, ""), [])
+            slot = self._sourceRows[row.source].index(row)
+            if slot >= len(mirror_rows) or mirror_rows[slot] is row:
+                continue
+
+            mirror_row = mirror_rows[slot]
+            if not overwrite and len(mirror_row.constraints) > 0:
+                continue
+            mirror_target = target_mirrors.get(row.target, "")
+            if mirror_target != "" and (overwrite or mirror_row.target == ""):
+                mirror_row.target = mirror_target
+            mirror_row.constraints = {}
+            for constrain_enum, constrain in row.constraints.items():
+                skip_axes = constrain.get_skip_mask()
+                skip_mask = sum(1 << i for i in range(3) if skip_axes & (1 << axis_map[i]))
+                mirror_row.constraints[constrain_enum] = Constrain.from_skip_mask(constrain_enum, skip_mask)
+            written.add(id(mirror_row))
+            count += 1
+        return count
+
+    def apply_and_bake(self, start: float, end: float, backend: ConstraintBackend = None,
+                       progress: ApplyProgress = None, chunk_size: int = None) -> dict:
+        if backend is None:
+            backend = MayaConstraintBackend()
+        return BatchConstraintApplier(backend, progress, chunk_size).apply_and_bake(self.get_apply_plan(), start, end)
+
+    def copy_animation(self, offset: float = 0.0, scale: float = 1.0, backend: AnimCurveBackend = None) -> dict:
+        if backend is None:
+            backend = MayaAnimCurveBackend()
+        return AnimationCopier(backend).copy(self.get_apply_plan(), offset, scale)
+
+    def retarget(self, start: float, end: float, reference_frame: float = None, sampler: MatrixSampler = None,
+                 curve_backend: AnimCurveBackend = None) -> dict:
+        if sampler is None:
+            sampler = MayaMatrixSampler()
+        if curve_backend is None:
+            curve_backend = MayaAnimCurveBackend()
+        reference_frame = start if reference_frame is None else reference_frame
+        frames = [float(frame) for frame in range(int(math.floor(start)), int(math.ceil(end)) + 1)]
+        return Retargeter(sampler, curve_backend).retarget(self.get_apply_plan(), frames, reference_frame)
+
+    def save(self, file_name):
+        data = JsonDataManager()
+        data.set_data(self.get_sources(), self.get_targets(), self.get_constraints())
+        data.save(file_name)
+
+
+class MappingTemplate(object):
+    # a mapping with its source and target namespaces taken out. Names are rewritten once into format strings,
+    # applying the template to many namespace pairs only formats them into a single combined plan
+
+    def __init__(self, model: MatchingModel, source_namespace: str = None, target_namespace: str = None):
+        if source_namespace is None:
+            source_namespace = self.detect_namespace(model.get_sources())
+        if target_namespace is None:
+            target_namespace = self.detect_namespace([target for target in model.get_targets() if target != ""])
+        self.sourceNamespace = source_namespace.strip(":")
+        self.targetNamespace = target_namespace.strip(":")
+        self.scope = model.get_scope()
+        # every instance is registered under its own scope, built like the model's. The model's own namespaces
+        # give back the model's scope
+        self.name = model.name
+        self.scopeRoot = self.get_name_format(model.rows[0].source, self.sourceNamespace) if len(model.rows) > 0 else ""
+
+        plan = model.get_apply_plan()
+        self.rowsCount = plan.rowsCount
+        self.skippedRows = list(plan.skippedRows)
+        self.groups = {
+            signature: [(self.get_name_format(source, self.sourceNamespace),
+                         self.get_name_format(target, self.targetNamespace)) for source, target in pairs]
+            for signature, pairs in plan.groups.items()
+        }
+
+    @staticmethod
+    def detect_namespace(names: list) -> str:
+        # most common root namespace, "" when most names have none
+        counts = {}
+        for name in names:
+            short_name = name.rsplit("|", 1)[-1]
+            namespace = short_name.partition(":")[0] if ":" in short_name else ""
+            counts[namespace] = counts.get(namespace, 0) + 1
+        return max(counts, key=counts.get) if len(counts) > 0 else ""
+
+    @staticmethod
+    def get_name_format(name: str, namespace: str) -> str:
+        # "|grp|charA:hips" -> "|grp|{0}hips", every path component in the namespace gets the placeholder
+        components = name.replace("{", "{{").replace("}", "}}").split("|")
+        prefix = namespace + ":" if namespace != "" else ""
+        for i, component in enumerate(components):
+            if component != "" and component.startswith(prefix):
+                components[i] = "{0}" + component[len(prefix):]
+        return "|".join(components)
+
+    @staticmethod
+    def parse_namespace_pairs(text: str, source_namespace: str) -> list:
+        # "charB, mocap2>charC": targets alone keep the template's source namespace
+        pairs = []
+        for entry in text.split(","):
+            entry = entry.strip()
+            if entry == "":
+                continue
+            source, separator, target = entry.rpartition(">")
+            pairs.append((source.strip().strip(":") if separator != "" else source_namespace,
+                          target.strip().strip(":")))
+        return pairs
+
+    def get_apply_plan(self, namespace_pairs: list) -> ConstraintApplyPlan:
+        plan = ConstraintApplyPlan()
+        for source_namespace, target_namespace in namespace_pairs:
+            source_prefix = source_namespace.strip(":") + ":" if source_namespace.strip(":") != "" else ""
+            target_prefix = target_namespace.strip(":") + ":" if target_namespace.strip(":") != "" else ""
+            scope = self.get_instance_scope(source_prefix, target_namespace.strip(":"))
+            for signature, pairs in self.groups.items():
+                instance_pairs = [(source.format(source_prefix), target.format(target_prefix))
+                                  for source, target in pairs]
+                plan.groups.setdefault(signature, []).extend(instance_pairs)
+                plan.targetScopes.update((target, scope) for source, target in instance_pairs)
+            plan.skippedRows.extend(plan.rowsCount + row for row in self.skippedRows)
+            plan.rowsCount += self.rowsCount
+        return plan
+
+    def get_instance_scope(self, source_prefix: str, target_namespace: str) -> str:
+        if self.name != "":
+            # the name takes the place of the root
+            return self.name if target_namespace == self.targetNamespace else \
+                MatchingModel.get_instance_scope(self.name, target_namespace)
+        return MatchingModel.get_instance_scope(self.scopeRoot.format(source_prefix), target_namespace)
+
+    def apply(self, namespace_pairs: list, backend: ConstraintBackend = None, progress: ApplyProgress = None,
+              chunk_size: int = None) -> dict:
+        # every instance is validated and created together: one undo chunk, one command batch per group and chunk
+        if backend is None:
+            backend = MayaConstraintBackend()
+        summary = BatchConstraintApplier(backend, progress, chunk_size).apply(self.get_apply_plan(namespace_pairs),
+                                                                             self.scope)
+        summary["instances"] = len(namespace_pairs)
+        return summary
+
+
+class PresetLibrary(object):
+    # directory of mapping files with a persistent index (root, joints count, source names hash, mtime), parsed
+    # presets are shared by every library instance through an LRU cache keyed by path and mtime
+    indexFileName = ".constraintsMatchingIndex.json"
+    indexVersion = 1
+    cacheSize = 16
+    _cache = OrderedDict()
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.indexPath = os.path.join(directory, self.indexFileName)
+        self.entries = {}
+        self._read_index()
+
+    def _read_index(self):
+        try:
+            with open(self.indexPath, "r", encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return
+
+        if index.get("version") == self.indexVersion:
+            self.entries = index.get("entries", {})
+
+    def _write_index(self):
+        try:
+            with open(self.indexPath, "w", encoding="utf-8") as index_file:
+                json.dump({"version": self.indexVersion, "entries": self.entries}, index_file)
+        except OSError as error:
+            print("++++ preset index {} couldn't be saved: {} ++++".format(self.indexPath, error))
+
+    @staticmethod
+    def get_sources_hash(sources) -> str:
+        base_names = sorted({NameMatchingRule.split_name(source)[1] for source in sources})
+        return hashlib.sha1("\n".join(base_names).encode("utf-8")).hexdigest()
+
+    def scan(self) -> int:
+        # only new or modified files are parsed, returns how many were
+        parsed = 0
+        entries = {}
+        for directory, sub_directories, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                if not (file_name.endswith(".json") or file_name.endswith(".json.gz")) or \
+                        file_name == self.indexFileName:
+                    continue
+
+                path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                relative_path = os.path.relpath(path, self.directory)
+                entry = self.entries.get(relative_path)
+                if entry is None or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+                    entry = self._index_file(path, stat)
+                    parsed += 1
+                if entry is not None:
+                    entries[relative_path] = entry
+
+        if parsed > 0 or len(entries) != len(self.entries):
+            self.entries = entries
+            self._write_index()
+        return parsed
+
+    def _index_file(self, path: str, stat) -> dict:
+        try:
+            sources = [source for source, target, constraints in JsonDataManager.iter_rows(path)]
+        except (ValueError, KeyError, TypeError, IndexError, OSError):
+            return None
+
+        return {
+            "root": NameMatchingRule.split_name(sources[0])[1] if len(sources) > 0 else "",
+            "joints": len(set(sources)),
+            "sourcesHash": self.get_sources_hash(sources),
+            "mtime": stat.st_mtime,
+            "size": stat.st_size
+        }
+
+    def find(self, root: str, sources: list = None) -> list:
+        # presets for the root (namespace agnostic), exact source hierarchies first, then by joints count
+        root = NameMatchingRule.split_name(root)[1]
+        sources_hash = self.get_sources_hash(sources) if sources else None
+        joints = len(set(sources)) if sources else 0
+        matches = [(relative_path, entry) for relative_path, entry in self.entries.items() if entry["root"] == root]
+        matches.sort(key=lambda match: (match[1]["sourcesHash"] != sources_hash,
+                                        abs(match[1]["joints"] - joints),
+                                        match[0]))
+        return [os.path.join(self.directory, relative_path) for relative_path, entry in matches]
+
+    def load(self, path: str) -> "MatchingModel":
+        try:
+            key = (os.path.abspath(path), os.stat(path).st_mtime)
+        except OSError:
+            return None
+
+        cache = PresetLibrary._cache
+        if key in cache:
+            cache.move_to_end(key)
+        else:
+            model = MatchingModel.from_json(path)
+            if model is None:
+                return None
+            cache[key] = model
+            while len(cache) > self.cacheSize:
+                cache.popitem(last=False)
+        # presets are edited in the tool, the cached model stays untouched
+        return cache[key].copy()
+
+
+class NameMatchingRule(ABC):
+
+    @abstractmethod
+    def apply(self, name: str) -> str:
+        raise NotImplementedError
+
+    @staticmethod
+    def split_name(name: str) -> (str, str):
+        # "|grp|ns:L_arm" -> ("ns:", "L_arm")
+        short_name = name.rsplit("|", 1)[-1]
+        namespace, separator, base_name = short_name.rpartition(":")
+        return namespace + separator, base_name
+
+
+class PrefixSwapRule(NameMatchingRule):
+
+    def __init__(self, old: str, new: str):
+        self.old = old
+        self.new = new
+
+    def apply(self, name: str) -> str:
+        namespace, base_name = self.split_name(name)
+        if self.old != "" and base_name.startswith(self.old):
+            base_name = self.new + base_name[len(self.old):]
+        elif self.old == "":
+            base_name = self.new + base_name
+        return namespace + base_name
+
+
+class SuffixSwapRule(NameMatchingRule):
+
+    def __init__(self, old: str, new: str):
+        self.old = old
+        self.new = new
+
+    def apply(self, name: str) -> str:
+        namespace, base_name = self.split_name(name)
+        if self.old != "" and base_name.endswith(self.old):
+            base_name = base_name[:-len(self.old)] + self.new
+        elif self.old == "":
+            base_name = base_name + self.new
+        return namespace + base_name
+
+
+class NamespaceRemapRule(NameMatchingRule):
+
+    def __init__(self, old: str, new: str):
+        self.old = old.rstrip(":")
+        self.new = new.rstrip(":")
+
+    def apply(self, name: str) -> str:
+        namespace, base_name = self.split_name(name)
+        if namespace.rstrip(":") != self.old:
+            return namespace + base_name
+        return "{}:{}".format(self.new, base_name) if self.new != "" else base_name
+
+
+class RegexRule(NameMatchingRule):
+
+    def __init__(self, pattern: str, replacement: str):
+        self.pattern = re.compile(pattern)
+        self.replacement = replacement
+
+    def apply(self, name: str) -> str:
+        namespace, base_name = self.split_name(name)
+        return namespace + self.pattern.sub(self.replacement, base_name)
+
+
+class TargetNameIndex(object):
+    # built once per target hierarchy so matching never queries the scene per row
+    maxFuzzyCandidates = 10
+    maxFuzzyPostings = 256
+
+    def __init__(self, names: list):
+        self.names = set()
+        self.byShortName = {}
+        self.byBaseName = {}
+        self.byNormalizedName = {}
+        self.byTrigram = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str):
+        self.names.add(name)
+        namespace, base_name = NameMatchingRule.split_name(name)
+        normalized_name = self.normalize(base_name)
+        self.byShortName.setdefault(namespace + base_name, []).append(name)
+        self.byBaseName.setdefault(base_name, []).append(name)
+        self.byNormalizedName.setdefault(normalized_name, []).append(name)
+        for trigram in self.get_trigrams(normalized_name):
+            self.byTrigram.setdefault(trigram, set()).add(name)
+
+    @staticmethod
+    def normalize(base_name: str) -> str:
+        return re.sub(r"[^a-z0-9]", "", base_name.lower())
+
+    @staticmethod
+    def get_trigrams(normalized_name: str) -> set:
+        padded_name = "  {} ".format(normalized_name)
+        return {padded_name[i:i + 3] for i in range(len(padded_name) - 2)}
+
+    def find(self, name: str) -> str:
+        if name in self.names:
+            return name
+
+        namespace, base_name = NameMatchingRule.split_name(name)
+        for names, key in ((self.byShortName, namespace + base_name),
+                           (self.byBaseName, base_name),
+                           (self.byNormalizedName, self.normalize(base_name))):
+            if key in names:
+                return names[key][0]
+        return ""
+
+    def find_fuzzy(self, name: str, cutoff: float) -> str:
+        normalized_name = self.normalize(NameMatchingRule.split_name(name)[1])
+        postings = [self.byTrigram[trigram] for trigram in self.get_trigrams(normalized_name)
+                    if trigram in self.byTrigram]
+        postings.sort(key=len)
+
+        # rarest trigrams first, common ones ("jnt", "bnd"...) only add noise and turn this into a full scan
+        shared_trigrams = {}
+        visited = 0
+        for candidates in postings:
+            if visited >= self.maxFuzzyPostings:
+                break
+            visited += len(candidates)
+            for candidate in candidates:
+                shared_trigrams[candidate] = shared_trigrams.get(candidate, 0) + 1
+
+        candidates = sorted(shared_trigrams, key=shared_trigrams.get, reverse=True)[:self.maxFuzzyCandidates]
+        best_name, best_ratio = "", cutoff
+        for candidate in candidates:
+            candidate_name = self.normalize(NameMatchingRule.split_name(candidate)[1])
+            ratio = difflib.SequenceMatcher(None, normalized_name, candidate_name).ratio()
+            if ratio >= best_ratio:
+                best_name, best_ratio = candidate, ratio
+        return best_name
+
+
+class NameMatcher(object):
+
+    def __init__(self, rules: list = None, fuzzy: bool = False, fuzzy_cutoff: float = 0.75):
+        self.rules = rules if rules is not None else []
+        self.fuzzy = fuzzy
+        self.fuzzyCutoff = fuzzy_cutoff
+
+    def get_candidate_name(self, source: str) -> str:
+        name = source
+        for rule in self.rules:
+            name = rule.apply(name)
+        return name
+
+    def match_one(self, source: str, index: TargetNameIndex) -> str:
+        name = self.get_candidate_name(source)
+        target = index.find(name)
+        if target == "" and self.fuzzy:
+            target = index.find_fuzzy(name, self.fuzzyCutoff)
+        return target
+
+    def match(self, sources: list, index: TargetNameIndex) -> list:
+        matches = {}
+        for source in sources:
+            if source not in matches:
+                matches[source] = self.match_one(source, index)
+        return [matches[source] for source in sources]
+
+
+class HierarchyTree(object):
+    # flat, index based hierarchy: parents[i] is the parent index of node i or -1 for roots
+
+    def __init__(self, names: list, parents: list, positions: list = None):
+        self.names = list(names)
+        self.parents = list(parents)
+        self.positions = positions
+        self.children = [[] for i in range(len(self.names))]
+        self.roots = []
+        for i, parent in enumerate(self.parents):
+            if parent == -1:
+                self.roots.append(i)
+            else:
+                self.children[parent].append(i)
+
+        self.depths = [0] * len(self.names)
+        self.subtreeSizes = [1] * len(self.names)
+        self.chainLengths = [0] * len(self.names)
+        order = self.get_breadth_first_order()
+        for i in order:
+            if self.parents[i] != -1:
+                self.depths[i] = self.depths[self.parents[i]] + 1
+        for i in reversed(order):
+            if self.parents[i] != -1:
+                self.subtreeSizes[self.parents[i]] += self.subtreeSizes[i]
+            if len(self.children[i]) == 1:
+                self.chainLengths[i] = self.chainLengths[self.children[i][0]] + 1
+
+    @classmethod
+    def from_paths(cls, names: list, paths: list, positions: list = None) -> "HierarchyTree":
+        path_indices = {path: i for i, path in enumerate(paths)}
+        parents = [path_indices.get(path.rpartition("|")[0], -1) for path in paths]
+        return cls(names, parents, positions)
+
+    @classmethod
+    def from_scene(cls, root, with_positions: bool = False) -> "HierarchyTree":
+        root = pymel.PyNode(root)
+        nodes = [root] + pymel.listRelatives(root, allDescendents=True, type="transform")
+        positions = None
+        if with_positions:
+            flat_positions = pymel.xform(nodes, query=True, worldSpace=True, translation=True)
+            positions = [flat_positions[i:i + 3] for i in range(0, len(flat_positions), 3)]
+        return cls.from_paths([node.name() for node in nodes], [node.fullPath() for node in nodes], positions)
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_breadth_first_order(self) -> list:
+        order = list(self.roots)
+        for i in order:
+            order.extend(self.children[i])
+        return order
+
+    def get_chain(self, index: int) -> list:
+        chain = [index]
+        while len(self.children[chain[-1]]) == 1:
+            chain.append(self.children[chain[-1]][0])
+        return chain
+
+
+def solve_assignment(cost) -> list:
+    # minimum cost matching between the rows and columns of a (small) cost matrix
+    try:
+        from scipy.optimize import linear_sum_assignment
+        rows, columns = linear_sum_assignment(cost)
+        return list(zip(rows.tolist(), columns.tolist()))
+    except ImportError:
+        pass
+
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    rows_count, columns_count = cost.shape
+    # Hungarian algorithm with potentials, O(rows^2 * columns)
+    u = [0.0] * (rows_count + 1)
+    v = [0.0] * (columns_count + 1)
+    matched_rows = [0] * (columns_count + 1)
+    way = [0] * (columns_count + 1)
+    for row in range(1, rows_count + 1):
+        matched_rows[0] = row
+        column = 0
+        min_values = [float("inf")] * (columns_count + 1)
+        used = [False] * (columns_count + 1)
+        while True:
+            used[column] = True
+            current_row = matched_rows[column]
+            delta = float("inf")
+            next_column = 0
+            for j in range(1, columns_count + 1):
+                if not used[j]:
+                    value = cost[current_row - 1, j - 1] - u[current_row] - v[j]
+                    if value < min_values[j]:
+                        min_values[j] = value
+                        way[j] = column
+                    if min_values[j] < delta:
+                        delta = min_values[j]
+                        next_column = j
+            for j in range(columns_count + 1):
+                if used[j]:
+                    u[matched_rows[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_values[j] -= delta
+            column = next_column
+            if matched_rows[column] == 0:
+                break
+        while column != 0:
+            previous_column = way[column]
+            matched_rows[column] = matched_rows[previous_column]
+            column = previous_column
+
+    pairs = [(matched_rows[j] - 1, j - 1) for j in range(1, columns_count + 1) if matched_rows[j] != 0]
+    if transposed:
+        pairs = [(column, row) for row, column in pairs]
+    return sorted(pairs)
+
+
+class TopologyMatcher(object):
+    # aligns two hierarchies top-down: siblings are assigned through small cost matrices and single child chains
+    # of different lengths are resampled, so every node takes part in one assignment only
+    depthWeight = 1.0
+    subtreeWeight = 1.0
+    childrenWeight = 0.5
+    chainWeight = 0.5
+    positionWeight = 2.0
+
+    def __init__(self, use_positions: bool = True):
+        self.usePositions = use_positions
+
+    def get_features(self, tree: HierarchyTree):
+        depths = numpy.asarray(tree.depths, dtype=float)
+        features = [
+            depths / max(depths.max(), 1.0) * self.depthWeight,
+            numpy.log1p(numpy.asarray(tree.subtreeSizes, dtype=float)) * self.subtreeWeight,
+            numpy.asarray([len(children) for children in tree.children], dtype=float) * self.childrenWeight,
+            numpy.log1p(numpy.asarray(tree.chainLengths, dtype=float)) * self.chainWeight
+        ]
+        features = numpy.stack(features, axis=1)
+        if self.usePositions and tree.positions is not None:
+            positions = numpy.asarray(tree.positions, dtype=float)
+            positions = positions - positions[tree.roots].mean(axis=0)
+            extent = numpy.abs(positions).max()
+            if extent > 0.0:
+                positions /= extent
+            features = numpy.concatenate([features, positions * self.positionWeight], axis=1)
+        return features
+
+    def match(self, source_tree: HierarchyTree, target_tree: HierarchyTree) -> dict:
+        if not numpy.lazy_is_available():
+            raise ImportError("numpy is needed to match hierarchies by topology")
+
+        source_features = self.get_features(source_tree)
+        target_features = self.get_features(target_tree)
+        if source_features.shape[1] != target_features.shape[1]:
+            source_features = source_features[:, :4]
+            target_features = target_features[:, :4]
+
+        matches = {}
+        pending = [(source_tree.roots, target_tree.roots)]
+        while pending:
+            source_nodes, target_nodes = pending.pop()
+            if len(source_nodes) == 0 or len(target_nodes) == 0:
+                continue
+
+            cost = numpy.abs(source_features[source_nodes][:, None, :] -
+                             target_features[target_nodes][None, :, :]).sum(axis=2)
+            for row, column in solve_assignment(cost):
+                confidence = float(numpy.exp(-cost[row, column]))
+                source_chain = source_tree.get_chain(source_nodes[row])
+                target_chain = target_tree.get_chain(target_nodes[column])
+                self._match_chains(source_chain, target_chain, confidence, matches)
+                pending.append((source_tree.children[source_chain[-1]], target_tree.children[target_chain[-1]]))
+
+        return {source_tree.names[source]: (target_tree.names[target], confidence)
+                for source, (target, confidence) in matches.items()}
+
+    @staticmethod
+    def _match_chains(source_chain: list, target_chain: list, confidence: float, matches: dict):
+        if len(source_chain) == len(target_chain):
+            for source, target in zip(source_chain, target_chain):
+                matches[source] = (target, confidence)
+            return
+
+        # chains of different lengths (twist joints...) are mapped proportionally, ends matching ends
+        ratio = min(len(source_chain), len(target_chain)) / max(len(source_chain), len(target_chain))
+        last_source = max(len(source_chain) - 1, 1)
+        for i, source in enumerate(source_chain):
+            target_index = int(round(i * (len(target_chain) - 1) / last_source))
+            end_confidence = confidence if i in (0, len(source_chain) - 1) else confidence * ratio
+            matches[source] = (target_chain[target_index], end_confidence)
+
+
+class SymmetryPairer(object):
+    # left/right pairs of a hierarchy: side tokens in the names first, then a spatial hash of the rest positions
+    # mirrored across the plane for the nodes the names can't pair. Both are a single pass over the nodes
+    sidePattern = re.compile(r"(?:(?<=_)|^)(?:(?:Left|Right|left|right|LEFT|RIGHT)(?=_|$|\d|[A-Z])|"
+                             r"(?:L|R|l|r|Lf|Rt|lf|rt)(?=_|$|\d))")
+    sideSwaps = {
+        "Left": "Right", "left": "right", "LEFT": "RIGHT", "L": "R", "l": "r", "Lf": "Rt", "lf": "rt"
+    }
+    sideSwaps.update({value: key for key, value in list(sideSwaps.items())})
+
+    def __init__(self, mirror_axis: int = 0, tolerance: float = 0.01):
+        self.mirrorAxis = mirror_axis
+        self.tolerance = tolerance
+
+    def get_mirror_name(self, name: str) -> str:
+        # "|grp|ns:L_arm" -> "|grp|ns:R_arm", "" for names without side token
+        components = name.split("|")
+        for i, component in enumerate(components):
+            namespace, base_name = NameMatchingRule.split_name(component)
+            components[i] = namespace + self.sidePattern.sub(lambda match: self.sideSwaps[match.group(0)], base_name)
+        mirror_name = "|".join(components)
+        return mirror_name if mirror_name != name else ""
+
+    def pair(self, names: list, positions: list = None) -> dict:
+        # name -> mirrored name, nodes on the mirror plane and nodes without counterpart are left out
+        name_set = set(names)
+        mirrors = {}
+        for name in names:
+            mirror_name = self.get_mirror_name(name)
+            if mirror_name in name_set:
+                mirrors[name] = mirror_name
+        if positions is None:
+            return mirrors
+
+        cells = {}
+        unpaired = [i for i, name in enumerate(names) if name not in mirrors]
+        for i in unpaired:
+            cells.setdefault(self._get_cell(positions[i]), []).append(i)
+        for i in unpaired:
+            if names[i] in mirrors or abs(positions[i][self.mirrorAxis]) <= self.tolerance:
+                continue
+            mirrored_position = list(positions[i])
+            mirrored_position[self.mirrorAxis] = -mirrored_position[self.mirrorAxis]
+            j = self._find_nearest(cells, positions, mirrored_position)
+            if j is not None and j != i and names[j] not in mirrors:
+                mirrors[names[i]] = names[j]
+                mirrors[names[j]] = names[i]
+        return mirrors
+
+    def _get_cell(self, position) -> tuple:
+        return tuple(int(math.floor(value / self.tolerance)) for value in position)
+
+    def _find_nearest(self, cells: dict, positions: list, position: list):
+        # the tolerance is the cell size, the match can only be in the 27 cells around the position
+        cell = self._get_cell(position)
+        nearest, nearest_distance = None, self.tolerance ** 2
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for j in cells.get((cell[0] + dx, cell[1] + dy, cell[2] + dz), []):
+                        distance = sum((a - b) ** 2 for a, b in zip(positions[j], position))
+                        if distance <= nearest_distance:
+                            nearest, nearest_distance = j, distance
+        return nearest
+
+
+class BackgroundTask(object):
+    # runs work(task) on a worker thread. Every batch it yields is handed to on_batch on the main thread through
+    # deliver, maya.utils.executeDeferred by default, then on_done(error) once the work is over. The work must not
+    # touch the scene. cancel() stops the worker at its next check and drops what wasn't delivered yet.
+    # Timings are recorded under name: ".worker" for the thread, ".deliver" for each batch handed to the main
+    # thread and the name alone from start() to on_done
+
+    def __init__(self, work, on_batch, on_done=None, deliver=None, name: str = "backgroundTask"):
+        self.name = name
+        self.work = work
+        self.onBatch = on_batch
+        self.onDone = on_done
+        self.deliver = deliver if deliver is not None else mayaUtils.executeDeferred
+        self._cancelled = threading.Event()
+        self._thread = None
+        self._startTime = 0.0
+
+    def start(self) -> "BackgroundTask":
+        self._startTime = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="constraintsMatchingTask", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self):
+        error = None
+        start_time = time.perf_counter()
+        try:
+            for batch in self.work(self):
+                if self.is_cancelled():
+                    return
+                self.deliver(functools.partial(self._call, self.onBatch, batch, ".deliver"))
+        except Exception as exception:
+            error = exception
+        PERFORMANCE_STATS.add_timing(self.name + ".worker", time.perf_counter() - start_time)
+        self.deliver(functools.partial(self._call, self.onDone, error, ""))
+
+    def _call(self, callback, argument, timing_suffix: str):
+        if self.is_cancelled():
+            return
+        start_time = time.perf_counter()
+        if callback is not None:
+            callback(argument)
+        if timing_suffix == "":
+            PERFORMANCE_STATS.add_timing(self.name, time.perf_counter() - self._startTime)
+        else:
+            PERFORMANCE_STATS.add_timing(self.name + timing_suffix, time.perf_counter() - start_time)
+
+
+class MatchingRowView(object):
+    # widgets of one visible row, callbacks read the index from here so it can be shifted after inserts/deletes
+
+    def __init__(self, index: int, slot):
+        self.index = index
+        self.slot = slot
+        self.layouts = []
+
+
+class ConstrainsMatchingTool(object):
+    constrainLabels = OrderedDict([
+        ("Parent", ConstrainEnum.PARENT_CONSTRAIN),
+        ("Point", ConstrainEnum.POINT_CONSTRAIN),
+        ("Orient", ConstrainEnum.ORIENT_CONSTRAIN),
+        ("Scale", ConstrainEnum.SCALE_CONSTRAIN)
+    ])
+
+    def __init__(self):
+        self._init_class_var()
+
+        if pymel.window(self.window, exists=True):
+            pymel.deleteUI(self.window, window=True)
+
+        self.window = pymel.window(self.window, title=self.title, widthHeight=self.windowSize)
+        NODE_HANDLE_CACHE.install_callbacks("window")
+        pymel.scriptJob(uiDeleted=[self.window, functools.partial(NODE_HANDLE_CACHE.remove_callbacks, "window")],
+                        runOnce=True)
+
+        self.mainLayout = pymel.columnLayout(adj=True)
+        pymel.text(self.title)
+        pymel.separator(height=20)
+
+        self._create_windows_fields()
+
+        pymel.showWindow()
+
+    def _init_class_var(self):
+        self.window = "CM_Window"
+        self.title = "Constraints creator"
+        self.windowSize = (800, 850)
+        self.targetUIList = []
+        self.sourceXTargetLayouts = []
+        self.model = MatchingModel()
+        self.sourceObject = None
+        self.pageSize = 50
+        self.currentPage = 0
+        self.rowsFilter = ""
+        self.filteredIndices = []
+        self.rowViews = []
+        self.depthFilter = ""
+        self.sourceDepths = None
+        self.selectedRows = set()
+        self.loadTask = None
+        self.loadingModel = None
+        self.previousModel = None
+        self.indexTask = None
+        self.targetNameIndex = None
+
+    def _create_windows_fields(self):
+        self._create_source_section()
+        self._create_presets_section()
+        self._create_auto_match_section()
+        self._create_stats_section()
+        self._create_target_section()
+
+    def _create_source_section(self):
+        pymel.text("Source object")
+        self.sourceLayout = pymel.rowLayout(
+            parent=self.mainLayout,
+            columnAlign6=["center"] * 6,
+            numberOfColumns=6
+        )
+
+        self.sourceTextfield = pymel.textFieldGrp(
+            label="Source root",
+            parent=self.sourceLayout,
+            editable=True
+        )
+
+        self._create_source_options()
+
+    def _create_source_options(self):
+        self.getSelectedButton = pymel.button(
+            label="Get selected",
+            parent=self.sourceLayout,
+            command=self._get_source_from_selection
+        )
+
+        self.getChildrenFromObjectButton = pymel.button(
+            label="Get children",
+            parent=self.sourceLayout,
+            command=self._get_children_from_source
+        )
+
+        self.clearButton = pymel.button(
+            label="Clear",
+            parent=self.sourceLayout,
+            command=self._clear_UI
+        )
+
+        self.loadJsonButton = pymel.button(
+            label="Load Json",
+            parent=self.sourceLayout,
+            command=self._load_json
+        )
+
+        self.cancelLoadingButton = pymel.button(
+            label="Cancel loading",
+            parent=self.sourceLayout,
+            command=lambda *args: self._cancel_loading()
+        )
+        pymel.separator(parent=self.mainLayout)
+
+    def _create_presets_section(self):
+        self.presetsLayout = pymel.frameLayout(
+            label="Presets",
+            parent=self.mainLayout,
+            collapsable=True,
+            collapse=True
+        )
+        presets_column = pymel.columnLayout(parent=self.presetsLayout, adjustableColumn=True)
+        directory = pymel.optionVar.get(PRESETS_DIRECTORY_OPTION_VAR, "")
+        self.presetsDirectoryField = pymel.textFieldButtonGrp(
+            label="Presets directory",
+            parent=presets_column,
+            text=directory,
+            buttonLabel="Browse",
+            buttonCommand=lambda *args: self._browse_presets_directory()
+        )
+        pymel.button(
+            label="Find presets for source",
+            parent=presets_column,
+            command=self._find_presets
+        )
+        self.presetsList = pymel.textScrollList(parent=presets_column, height=80, allowMultiSelection=False)
+        pymel.button(
+            label="Load preset",
+            parent=presets_column,
+            command=self._load_selected_preset
+        )
+
+    def _browse_presets_directory(self):
+        directory = pymel.fileDialog2(fileMode=3, dialogStyle=2)
+        if directory is None or len(directory) == 0:
+            return
+
+        pymel.textFieldButtonGrp(self.presetsDirectoryField, edit=True, text=directory[0])
+
+    def _get_preset_library(self) -> PresetLibrary:
+        directory = pymel.textFieldButtonGrp(self.presetsDirectoryField, query=True, text=True)
+        if directory == "" or not os.path.isdir(directory):
+            print("++++ invalid presets directory: {} ++++".format(directory))
+            return None
+
+        pymel.optionVar[PRESETS_DIRECTORY_OPTION_VAR] = directory
+        return PresetLibrary(directory)
+
+    def _find_presets(self, *args):
+        library = self._get_preset_library()
+        if library is None:
+            return
+        if self.sourceObject is None:
+            print("++++ select a source root to find its presets ++++")
+            return
+
+        library.scan()
+        sources = self.model.get_sources() if len(self.model) > 0 else None
+        presets = library.find(self.sourceObject.name(), sources)
+        pymel.textScrollList(self.presetsList, edit=True, removeAll=True)
+        if len(presets) > 0:
+            pymel.textScrollList(self.presetsList, edit=True, append=presets)
+        print("++++ {} presets found ++++".format(len(presets)))
+
+    def _load_selected_preset(self, *args):
+        selected = pymel.textScrollList(self.presetsList, query=True, selectItem=True)
+        library = self._get_preset_library()
+        if not selected or library is None:
+            return
+
+        model = library.load(selected[0])
+        if model is None or not model.is_valid():
+            print("++++ an error trying to read preset {} has occurred ++++".format(selected[0]))
+            return
+
+        self._set_model(model)
+
+    def _set_model(self, model: MatchingModel, source_depths: dict = None):
+        if self.loadTask is not None and model is not self.loadingModel:
+            # whatever replaces the model while rows are streaming in wins, the load would overwrite it
+            self.loadTask.cancel()
+            self.loadTask = None
+            self.loadingModel = None
+            self.previousModel = None
+        self.model = model
+        self.selectedRows.clear()
+        self.sourceDepths = source_depths
+        self.currentPage = 0
+        self._display_matching_source_x_target()
+
+    def _create_stats_section(self):
+        self.statsLayout = pymel.frameLayout(
+            label="Stats",
+            parent=self.mainLayout,
+            collapsable=True,
+            collapse=True
+        )
+        stats_row = pymel.rowLayout(parent=self.statsLayout, numberOfColumns=5)
+        pymel.checkBox(
+            label="Count commands",
+            parent=stats_row,
+            value=PERFORMANCE_STATS.countCommands,
+            changeCommand=self._on_count_commands_changed
+        )
+        pymel.checkBox(
+            label="cProfile",
+            parent=stats_row,
+            value=PERFORMANCE_STATS.profiler is not None,
+            changeCommand=lambda value, *args: PERFORMANCE_STATS.set_profiling(value)
+        )
+        pymel.button(label="Print stats", parent=stats_row, command=lambda *args: PERFORMANCE_STATS.print_report())
+        pymel.button(label="Reset", parent=stats_row, command=lambda *args: PERFORMANCE_STATS.reset())
+        pymel.button(label="Save profile", parent=stats_row, command=self._save_profile)
+
+    @staticmethod
+    def _on_count_commands_changed(value, *args):
+        PERFORMANCE_STATS.countCommands = value
+
+    def _save_profile(self, *args):
+        save_file = pymel.fileDialog2(fileFilter="*.prof", dialogStyle=2)
+        if save_file is None or len(save_file) == 0:
+            return
+
+        if PERFORMANCE_STATS.save_profile(save_file[0]):
+            print("++++ profile saved to {} ++++".format(save_file[0]))
+        else:
+            print("++++ enable cProfile before saving a profile ++++")
+
+    def _create_auto_match_section(self):
+        self.autoMatchLayout = pymel.frameLayout(
+            label="Auto match",
+            parent=self.mainLayout,
+            collapsable=True,
+            collapse=True
+        )
+        auto_match_column = pymel.columnLayout(parent=self.autoMatchLayout, adjustableColumn=True)
+        self.targetRootTextField = pymel.textFieldButtonGrp(
+            label="Target root",
+            parent=auto_match_column,
+            editable=True,
+            buttonLabel="Get selected",
+            buttonCommand=lambda *args: self._on_target_root_select()
+        )
+        self.namespaceRuleField = pymel.textFieldGrp(label="Namespace from/to", parent=auto_match_column,
+                                                     numberOfFields=2)
+        self.prefixRuleField = pymel.textFieldGrp(label="Prefix from/to", parent=auto_match_column,
+                                                  numberOfFields=2)
+        self.suffixRuleField = pymel.textFieldGrp(label="Suffix from/to", parent=auto_match_column,
+                                                  numberOfFields=2)
+        self.regexRuleField = pymel.textFieldGrp(label="Regex/replacement", parent=auto_match_column,
+                                                 numberOfFields=2)
+        self.fuzzyCheckBox = pymel.checkBox(label="Fuzzy fallback", parent=auto_match_column, value=True)
+        self.overwriteCheckBox = pymel.checkBox(label="Overwrite targets", parent=auto_match_column, value=False)
+        pymel.button(
+            label="Auto match",
+            parent=auto_match_column,
+            command=self._auto_match_targets
+        )
+        pymel.separator(parent=auto_match_column)
+        self.restPositionsCheckBox = pymel.checkBox(label="Use rest positions", parent=auto_match_column, value=True)
+        self.minConfidenceField = pymel.floatFieldGrp(
+            label="Min confidence",
+            parent=auto_match_column,
+            value1=0.5
+        )
+        pymel.button(
+            label="Match by topology",
+            parent=auto_match_column,
+            command=self._topology_match_targets
+        )
+        pymel.separator(parent=auto_match_column)
+        pymel.button(
+            label="Mirror mapping",
+            parent=auto_match_column,
+            annotation="Copies the rows of one side to the other, pairs are found by name then by rest position",
+            command=self._mirror_mapping
+        )
+
+    def _on_target_root_select(self):
+        selected_list = pymel.ls(selection=True)
+        if len(selected_list) == 0:
+            return
+
+        pymel.textFieldButtonGrp(self.targetRootTextField, edit=True, text=selected_list[0].name())
+        self._build_target_name_index(selected_list[0].name())
+
+    def _build_target_name_index(self, target_root: str):
+        # the names are listed here, the index is built by a worker and ready by the time auto match is clicked
+        if self.indexTask is not None:
+            self.indexTask.cancel()
+        self.targetNameIndex = None
+        target_names = (cmds.listRelatives(target_root, allDescendents=True, path=True) or []) + [target_root]
+        self.indexTask = BackgroundTask(lambda task: [(target_root, TargetNameIndex(target_names))],
+                                        self._on_target_name_index_built, name="targetNameIndex").start()
+
+    def _on_target_name_index_built(self, target_name_index: tuple):
+        self.indexTask = None
+        self.targetNameIndex = target_name_index
+
+    def _get_name_matcher(self) -> NameMatcher:
+        rules = []
+        for field, rule_class in ((self.namespaceRuleField, NamespaceRemapRule),
+                                  (self.prefixRuleField, PrefixSwapRule),
+                                  (self.suffixRuleField, SuffixSwapRule),
+                                  (self.regexRuleField, RegexRule)):
+            old = pymel.textFieldGrp(field, query=True, text1=True)
+            new = pymel.textFieldGrp(field, query=True, text2=True)
+            if old != "" or new != "":
+                rules.append(rule_class(old, new))
+
+        return NameMatcher(rules, fuzzy=pymel.checkBox(self.fuzzyCheckBox, query=True, value=True))
+
+    @PERFORMANCE_STATS.timed("autoMatch")
+    def _auto_match_targets(self, *args):
+        target_root = pymel.textFieldButtonGrp(self.targetRootTextField, query=True, text=True)
+        if len(self.model) == 0 or target_root == "" or not pymel.objExists(target_root):
+            print("++++ a source hierarchy and an existing target root are needed to auto match ++++")
+            return
+
+        index = None
+        target_names = None
+        if self.targetNameIndex is not None and self.targetNameIndex[0] == target_root:
+            index = self.targetNameIndex[1]
+        else:
+            target_names = [target.name() for target in pymel.listRelatives(target_root, allDescendents=True)]
+            target_names.append(target_root)
+        try:
+            matcher = self._get_name_matcher()
+        except re.error as error:
+            print("++++ invalid regex: {} ++++".format(error))
+            return
+
+        overwrite = pymel.checkBox(self.overwriteCheckBox, query=True, value=True)
+        matched = self.model.auto_match(target_names, matcher, overwrite, index)
+        print("++++ {} targets matched ++++".format(matched))
+        self._display_matching_source_x_target()
+
+    @PERFORMANCE_STATS.timed("topologyMatch")
+    def _topology_match_targets(self, *args):
+        target_root = pymel.textFieldButtonGrp(self.targetRootTextField, query=True, text=True)
+        if self.sourceObject is None or len(self.model) == 0 or target_root == "" or not pymel.objExists(target_root):
+            print("++++ a source hierarchy and an existing target root are needed to match by topology ++++")
+            return
+
+        use_positions = pymel.checkBox(self.restPositionsCheckBox, query=True, value=True)
+        min_confidence = pymel.floatFieldGrp(self.minConfidenceField, query=True, value1=True)
+        overwrite = pymel.checkBox(self.overwriteCheckBox, query=True, value=True)
+        source_tree = HierarchyTree.from_scene(self.sourceObject, use_positions)
+        target_tree = HierarchyTree.from_scene(target_root, use_positions)
+        confidences = self.model.topology_match(source_tree, target_tree, TopologyMatcher(use_positions),
+                                                min_confidence, overwrite)
+        low_confidence = sum(1 for confidence in confidences if confidence < min_confidence)
+        print("++++ topology match done, {} rows under {} confidence ++++".format(low_confidence, min_confidence))
+        self._display_matching_source_x_target()
+
+    @PERFORMANCE_STATS.timed("mirror")
+    def _mirror_mapping(self, *args):
+        if self.sourceObject is None or len(self.model) == 0:
+            print("++++ a source hierarchy is needed to mirror the mapping ++++")
+            return
+
+        use_positions = pymel.checkBox(self.restPositionsCheckBox, query=True, value=True)
+        pairer = SymmetryPairer()
+        source_tree = HierarchyTree.from_scene(self.sourceObject, use_positions)
+        source_mirrors = pairer.pair(source_tree.names, source_tree.positions)
+        target_root = pymel.textFieldButtonGrp(self.targetRootTextField, query=True, text=True)
+        if target_root != "" and pymel.objExists(target_root):
+            target_tree = HierarchyTree.from_scene(target_root, use_positions)
+            target_mirrors = pairer.pair(target_tree.names, target_tree.positions)
+        else:
+            target_mirrors = pairer.pair([target for target in self.model.get_targets() if target != ""])
+
+        overwrite = pymel.checkBox(self.overwriteCheckBox, query=True, value=True)
+        count = self.model.mirror(source_mirrors, target_mirrors, overwrite=overwrite)
+        print("++++ {} rows mirrored ++++".format(count))
+        self._display_matching_source_x_target()
+
+    def _create_target_section(self):
+        self._create_paging_section()
+        self._create_bulk_edit_section()
+        self.scrollLayout = pymel.scrollLayout(
+            parent=self.mainLayout,
+            childResizable=True,
+            height=500,
+        )
+        self.targetUIList.append(pymel.separator(parent=self.mainLayout))
+        self.applyLayout = pymel.rowLayout(parent=self.mainLayout, numberOfColumns=4, adjustableColumn=4)
+        pymel.button(
+            label="Validate",
+            parent=self.applyLayout,
+            command=self._validate_mapping
+        )
+        self.chunkSizeField = pymel.intField(
+            parent=self.applyLayout,
+            value=BatchConstraintApplier.chunkSize,
+            minValue=1,
+            annotation="Constraints created between two progress updates, ESC cancels the apply"
+        )
+        self.incrementalCheckBox = pymel.checkBox(
+            label="Only changes",
+            parent=self.applyLayout,
+            value=True,
+            annotation="Keeps the matching constraints of a previous apply, only the edited rows are changed"
+        )
+        pymel.button(
+            label="Apply",
+            parent=self.applyLayout,
+            command=self._apply_constrains
+        )
+        self.targetUIList.append(self.applyLayout)
+        self.namespacesField = pymel.textFieldButtonGrp(
+            label="Target namespaces",
+            parent=self.mainLayout,
+            text="",
+            buttonLabel="Apply to all",
+            annotation="Comma separated, 'source>target' to change the source namespace too",
+            buttonCommand=lambda *args: self._apply_to_namespaces()
+        )
+        self.targetUIList.append(self.namespacesField)
+        self.targetUIList.append(pymel.separator(parent=self.mainLayout))
+        self.bakeLayout = pymel.rowLayout(parent=self.mainLayout, numberOfColumns=3, adjustableColumn=2)
+        self.bakeRangeField = pymel.floatFieldGrp(
+            label="Bake range",
+            parent=self.bakeLayout,
+            numberOfFields=2,
+            value1=pymel.playbackOptions(query=True, minTime=True),
+            value2=pymel.playbackOptions(query=True, maxTime=True)
+        )
+        pymel.button(
+            label="Apply and bake",
+            parent=self.bakeLayout,
+            command=self._apply_and_bake
+        )
+        pymel.button(
+            label="Retarget keys",
+            parent=self.bakeLayout,
+            annotation="Solves the maintain offset transforms for the bake range without creating constraints",
+            command=self._retarget_keys
+        )
+        self.targetUIList.append(self.bakeLayout)
+        self.copyAnimationLayout = pymel.rowLayout(parent=self.mainLayout, numberOfColumns=2, adjustableColumn=2)
+        self.timeRemapField = pymel.floatFieldGrp(
+            label="Time offset/scale",
+            parent=self.copyAnimationLayout,
+            numberOfFields=2,
+            value1=0.0,
+            value2=1.0
+        )
+        pymel.button(
+            label="Copy animation",
+            parent=self.copyAnimationLayout,
+            command=self._copy_animation
+        )
+        self.targetUIList.append(self.copyAnimationLayout)
+        self.targetUIList.append(pymel.separator(parent=self.mainLayout))
+        self.deleteLayout = pymel.rowLayout(parent=self.mainLayout, numberOfColumns=3)
+        pymel.button(
+            label="Delete this mapping constraints",
+            parent=self.deleteLayout,
+            command=lambda *args: self._delete_created_constraints(True)
+        )
+        pymel.button(
+            label="Delete created constraints",
+            parent=self.deleteLayout,
+            command=lambda *args: self._delete_created_constraints(False)
+        )
+        pymel.button(
+            label="Delete all constraints in scene",
+            parent=self.deleteLayout,
+            command=self._delete_constraints
+        )
+        self.targetUIList.append(self.deleteLayout)
+        self.targetUIList.append(pymel.separator(parent=self.mainLayout))
+        self.targetUIList.append(pymel.button(
+            label="Save as json",
+            parent=self.mainLayout,
+            command=self._save_as_json
+        ))
+        self.targetUIList.append(pymel.separator(parent=self.mainLayout))
+
+        self.targetUIList.append(self.scrollLayout)
+
+    def _create_paging_section(self):
+        self.pagingLayout = pymel.rowLayout(
+            parent=self.mainLayout,
+            numberOfColumns=8,
+            adjustableColumn=2
+        )
+        pymel.text("Filter", parent=self.pagingLayout)
+        self.filterTextField = pymel.textField(
+            parent=self.pagingLayout,
+            text=self.rowsFilter,
+            annotation="Part of the source name, or a pattern with * and ?",
+            changeCommand=self._on_filter_changed
+        )
+        pymel.text("Depth", parent=self.pagingLayout)
+        self.depthFilterField = pymel.textField(
+            parent=self.pagingLayout,
+            text=self.depthFilter,
+            width=50,
+            annotation="Hierarchy depth of the source, '3' or '2-4'",
+            changeCommand=self._on_filter_changed
+        )
+        pymel.button(label="<", parent=self.pagingLayout, command=lambda *args: self._change_page(-1))
+        self.pageText = pymel.text(label="", parent=self.pagingLayout)
+        pymel.button(label=">", parent=self.pagingLayout, command=lambda *args: self._change_page(1))
+        self.pageSizeField = pymel.intField(
+            parent=self.pagingLayout,
+            value=self.pageSize,
+            minValue=1,
+            annotation="Rows per page",
+            changeCommand=self._on_page_size_changed
+        )
+        self.targetUIList.append(self.pagingLayout)
+
+    def _create_bulk_edit_section(self):
+        self.bulkEditLayout = pymel.rowLayout(parent=self.mainLayout, numberOfColumns=8)
+        pymel.button(label="Select filtered", parent=self.bulkEditLayout, command=self._select_filtered_rows)
+        pymel.button(label="Select none", parent=self.bulkEditLayout, command=self._select_no_rows)
+        self.bulkConstrainMenu = pymel.optionMenu(parent=self.bulkEditLayout)
+        for label in self.constrainLabels:
+            pymel.menuItem(label=label, parent=self.bulkConstrainMenu)
+        self.bulkSkipAxesField = pymel.checkBoxGrp(
+            parent=self.bulkEditLayout,
+            numberOfCheckBoxes=3,
+            label="Skip axes",
+            labelArray3=["x", "y", "z"]
+        )
+        pymel.button(label="Set", parent=self.bulkEditLayout, command=self._set_selected_constraints)
+        pymel.button(label="Remove", parent=self.bulkEditLayout,
+                     command=lambda *args: self._remove_selected_constraints(False))
+        pymel.button(label="Clear", parent=self.bulkEditLayout,
+                     command=lambda *args: self._remove_selected_constraints(True))
+        pymel.button(label="Copy first", parent=self.bulkEditLayout,
+                     annotation="Copies the constraints of the first selected row to the other selected rows",
+                     command=self._copy_selected_constraints)
+        self.targetUIList.append(self.bulkEditLayout)
+
+    def _get_selected_indices(self) -> list:
+        indices = sorted(index for index in self.selectedRows if index < len(self.model))
+        if len(indices) == 0:
+            print("++++ no row selected ++++")
+        return indices
+
+    def _select_filtered_rows(self, *args):
+        self.selectedRows.update(self.filteredIndices)
+        self._display_matching_source_x_target()
+
+    def _select_no_rows(self, *args):
+        self.selectedRows.clear()
+        self._display_matching_source_x_target()
+
+    def _on_row_selected(self, index: int, value: bool):
+        if value:
+            self.selectedRows.add(index)
+        else:
+            self.selectedRows.discard(index)
+
+    def _get_bulk_constrain_enum(self) -> ConstrainEnum:
+        return self.constrainLabels[pymel.optionMenu(self.bulkConstrainMenu, query=True, value=True)]
+
+    def _set_selected_constraints(self, *args):
+        indices = self._get_selected_indices()
+        if len(indices) == 0:
+            return
+
+        skip_axes = tuple(pymel.checkBoxGrp(self.bulkSkipAxesField, query=True, **{"value{}".format(i): True})
+                          for i in range(1, 4))
+        self.model.set_constraints(indices, self._get_bulk_constrain_enum(), skip_axes)
+        self._display_matching_source_x_target()
+
+    def _remove_selected_constraints(self, all_types: bool):
+        indices = self._get_selected_indices()
+        if len(indices) == 0:
+            return
+
+        self.model.remove_constraints(indices, None if all_types else self._get_bulk_constrain_enum())
+        self._display_matching_source_x_target()
+
+    def _copy_selected_constraints(self, *args):
+        indices = self._get_selected_indices()
+        if len(indices) < 2:
+            return
+
+        self.model.copy_constraints(indices[0], indices[1:])
+        self._display_matching_source_x_target()
+
+    def _on_filter_changed(self, *args):
+        self.rowsFilter = pymel.textField(self.filterTextField, query=True, text=True)
+        self.depthFilter = pymel.textField(self.depthFilterField, query=True, text=True)
+        self.currentPage = 0
+        self._display_matching_source_x_target()
+
+    def _on_page_size_changed(self, *args):
+        self.pageSize = max(1, pymel.intField(self.pageSizeField, query=True, value=True))
+        self.currentPage = 0
+        self._display_matching_source_x_target()
+
+    def _change_page(self, step: int):
+        self.currentPage += step
+        self._display_matching_source_x_target()
+
+    def _get_pages_count(self) -> int:
+        return max(1, (len(self.filteredIndices) + self.pageSize - 1) // self.pageSize)
+
+    def _update_filtered_indices(self):
+        depth_range = self._get_depth_range()
+        if self.rowsFilter == "" and depth_range is None:
+            self.filteredIndices = list(range(len(self.model)))
+        else:
+            # the scene is only walked for a depth filter
+            source_depths = self._get_source_depths() if depth_range is not None else None
+            self.filteredIndices = self.model.find_rows(self.rowsFilter, depth_range, source_depths)
+
+    def _get_depth_range(self) -> tuple:
+        bounds = self.depthFilter.replace(" ", "").split("-", 1)
+        try:
+            return int(bounds[0]), int(bounds[-1])
+        except ValueError:
+            return None
+
+    def _get_source_depths(self) -> dict:
+        # read from the scene once per model, the depths don't change while the rows are edited
+        if self.sourceDepths is None:
+            if len(self.model) == 0:
+                return {}
+            root = self.sourceObject if self.sourceObject is not None else self.model.get_row(0).source
+            if not pymel.objExists(root):
+                return {}
+            tree = HierarchyTree.from_scene(root)
+            self.sourceDepths = dict(zip(tree.names, tree.depths))
+        return self.sourceDepths
+
+    def _get_page_indices(self) -> list:
+        self.currentPage = min(max(self.currentPage, 0), self._get_pages_count() - 1)
+        start = self.currentPage * self.pageSize
+        return self.filteredIndices[start:start + self.pageSize]
+
+    def _update_page_text(self):
+        pymel.text(self.pageText, edit=True, label="Page {}/{} ({} rows)".format(
+            self.currentPage + 1,
+            self._get_pages_count(),
+            len(self.filteredIndices)
+        ))
+
+    def _get_source_from_selection(self, *args):
+        selected_list = pymel.ls(selection=True)
+        if len(selected_list) == 0:
+            return
+
+        self.sourceObject = selected_list[0]
+        pymel.textFieldGrp(self.sourceTextfield, edit=True, text=self.sourceObject, editable=False)
+        return
+
+    @PERFORMANCE_STATS.timed("getChildren.query")
+    def _get_children_from_source(self, *args):
+        if self.sourceObject is None or self.sourceObject == "":
+            return
+
+        # two string-only queries on the main thread, the rows are built by the worker
+        root_path = self.sourceObject.fullPath()
+        names = cmds.listRelatives(root_path, allDescendents=True, path=True) or []
+        paths = cmds.listRelatives(root_path, allDescendents=True, fullPath=True) or []
+        root = self.sourceObject.name()
+        self._start_loading(lambda task: MatchingModel.iter_hierarchy_batches(root, root_path, names, paths, task=task),
+                            "getChildren")
+        return
+
+    def _start_loading(self, work, name: str):
+        self._cancel_loading()
+        self.previousModel = self.model
+        self.loadingModel = MatchingModel()
+        self.loadTask = BackgroundTask(work, self._on_rows_loaded, self._on_loading_done, name=name).start()
+        pymel.text(self.pageText, edit=True, label="Loading...")
+
+    def _on_rows_loaded(self, batch: tuple):
+        rows, depths = batch
+        for row in rows:
+            self.loadingModel._append_row(row)
+        if self.model is not self.loadingModel:
+            # the first page shows up with the first batch, the next ones only update the rows count
+            self._set_model(self.loadingModel, depths)
+            return
+
+        if depths is not None:
+            self.sourceDepths.update(depths)
+        self._update_filtered_indices()
+        if len(self.rowViews) < self.pageSize:
+            self._display_matching_source_x_target()
+        self._update_page_text()
+
+    def _on_loading_done(self, error):
+        self.loadTask = None
+        if error is not None or not self.loadingModel.is_valid():
+            print("++++ an error trying to load the rows has occurred: {} ++++".format(error))
+            self._set_model(self.previousModel)
+        else:
+            self._display_matching_source_x_target()
+        self.loadingModel = None
+        self.previousModel = None
+
+    def _cancel_loading(self):
+        if self.loadTask is None:
+            return
+
+        self.loadTask.cancel()
+        self.loadTask = None
+        self._set_model(self.previousModel)
+        self.loadingModel = None
+        self.previousModel = None
+        print("++++ loading cancelled ++++")
+
+    @PERFORMANCE_STATS.timed("displayRows")
+    def _display_matching_source_x_target(self):
+        # only the rows of the current page are built, so the cost doesn't depend on the hierarchy size
+        self._delete_source_x_target_layouts()
+        self._update_filtered_indices()
+        page_indices = self._get_page_indices()
+        self._update_page_text()
+        if len(self.model) == 0:
+            return
+
+        for i in page_indices:
+            self._create_source_x_target_row(i)
+
+    def _create_source_x_target_row(self, index: int, slot=None):
+        # every page entry owns a slot layout, extra targets are built inside the slot of their source row
+        # so they show up right below it without rebuilding the rest of the page
+        if slot is None:
+            slot = pymel.columnLayout(parent=self.scrollLayout, adjustableColumn=True)
+            self.sourceXTargetLayouts.append(slot)
+
+        row = MatchingRowView(index, slot)
+        separator = pymel.separator(parent=slot)
+        container_layout = pymel.rowLayout(
+            parent=slot,
+            numberOfColumns=2,
+            adjustableColumn=2,
+            rowAttach=[1, "top", 3]
+        )
+        row.layouts.append(container_layout)
+        row.layouts.append(separator)
+        self.rowViews.append(row)
+
+        self._create_source_column(container_layout, row)
+        self._create_target_column(container_layout, row)
+        return row
+
+    def _create_source_column(self, layout, row: "MatchingRowView"):
+        source_name = self.model.get_row(row.index).source
+        row_layout = pymel.columnLayout(parent=layout, adjustableColumn=True)
+
+        source_text_field = pymel.textFieldGrp(
+            label="Source: ",
+            parent=row_layout,
+            text=source_name,
+            editable=False,
+            columnAlign=[1, "center"]
+        )
+
+        source_add_target_button = pymel.button(
+            label="Add target",
+            parent=row_layout,
+            command=lambda *args: self._add_extra_target(row.index)
+        )
+        pymel.checkBox(
+            label="Selected",
+            parent=row_layout,
+            value=row.index in self.selectedRows,
+            changeCommand=lambda value, *args: self._on_row_selected(row.index, value)
+        )
+
+    def _add_extra_target(self, index: int):
+        index_updated = self.model.add_target(index)
+        if index_updated == -1:
+            print("Each source can have {} target at most".format(MatchingModel.maxTargetsPerSource))
+        else:
+            self._insert_row_view(index_updated)
+        return
+
+    def _insert_row_view(self, index: int):
+        for row in self.rowViews:
+            if row.index >= index:
+                row.index += 1
+        self.filteredIndices = [i + 1 if i >= index else i for i in self.filteredIndices]
+        self.selectedRows = {i + 1 if i >= index else i for i in self.selectedRows}
+
+        if index - 1 in self.filteredIndices:
+            self.filteredIndices.insert(self.filteredIndices.index(index - 1) + 1, index)
+
+        previous_row = self._get_row_view(index - 1)
+        if previous_row is not None:
+            self._create_source_x_target_row(index, previous_row.slot)
+        self._update_page_text()
+
+    def _remove_row_view(self, index: int):
+        row = self._get_row_view(index)
+        if row is not None:
+            for layout in row.layouts:
+                pymel.deleteUI(layout)
+            self.rowViews.remove(row)
+            if not pymel.columnLayout(row.slot, query=True, childArray=True):
+                pymel.deleteUI(row.slot)
+                self.sourceXTargetLayouts.remove(row.slot)
+
+        for row in self.rowViews:
+            if row.index > index:
+                row.index -= 1
+        self.filteredIndices = [i - 1 if i > index else i for i in self.filteredIndices if i != index]
+        self.selectedRows = {i - 1 if i > index else i for i in self.selectedRows if i != index}
+        self._update_page_text()
+
+    def _get_row_view(self, index: int):
+        for row in self.rowViews:
+            if row.index == index:
+                return row
+        return None
+
+    def _delete_source_x_target_layouts(self):
+        for layout in self.sourceXTargetLayouts:
+            pymel.deleteUI(layout)
+
+        self.sourceXTargetLayouts.clear()
+        self.rowViews.clear()
+
+    def _create_target_column(self, layout, row: "MatchingRowView"):
+        target_layout = pymel.columnLayout(parent=layout, adjustableColumn=True)
+
+        target = self.model.get_row(row.index).target
+        target_text_field = pymel.textFieldButtonGrp(
+            label="Target :",
+            parent=target_layout,
+            editable=True,
+            text=target,
+            buttonLabel="Get selected",
+            buttonCommand=lambda *args: self._on_target_select(target_text_field, row.index)
+        )
+        target_delete_button = pymel.button(
+            label="Delete target",
+            parent=target_layout,
+            command=lambda *args: self._delete_target(row.index)
+        )
+        self._create_constrains_checkbox(target_layout, row)
+        return
+
+    def _delete_target(self, index):
+        if self.model.remove_target(index):
+            self._remove_row_view(index)
+        else:
+            print("One target per source is needed at least")
+        return
+
+    def _create_constrains_checkbox(self, layout, row: "MatchingRowView"):
+        constraints_label = pymel.text("Constraints", parent=layout)
+        parent_check_box = self._create_constrain_checkbox(layout, row, ConstrainEnum.PARENT_CONSTRAIN, "Parent")
+        point_check_box = self._create_constrain_checkbox(layout, row, ConstrainEnum.POINT_CONSTRAIN, "Point")
+        orient_check_box = self._create_constrain_checkbox(layout, row, ConstrainEnum.ORIENT_CONSTRAIN, "Orient")
+        scale_check_box = self._create_constrain_checkbox(layout, row, ConstrainEnum.SCALE_CONSTRAIN, "Scale")
+        return
+
+    def _create_constrain_checkbox(self, layout, row: "MatchingRowView", constrain_enum: ConstrainEnum, label):
+        row_layout = pymel.rowLayout(parent=layout, adjustableColumn=1, numberOfColumns=2)
+        constraints = self.model.get_row(row.index).constraints
+        constrain_value = constrain_enum in constraints.keys()
+
+        check_box = pymel.checkBox(
+            parent=row_layout,
+            label=label,
+            value=constrain_value,
+            onCommand=lambda *args: self._create_constrain_axes(row.index, constrain_enum),
+            offCommand=lambda *args: self._delete_constrain(row.index, constrain_enum)
+        )
+        axes = [False,False,False] if not constrain_value else constraints[constrain_enum].get_axes_tuple()
+        axes_checkbox = pymel.checkBoxGrp(
+            parent=row_layout,
+            numberOfCheckBoxes=3,
+            label="Skip axes",
+            labelArray3=["x", "y", "z"],
+            value1=axes[0], value2=axes[1], value3=axes[2],
+            onCommand1=lambda *args: self._update_constrain_axes(row.index, constrain_enum, "X", True),
+            onCommand2=lambda *args: self._update_constrain_axes(row.index, constrain_enum, "Y", True),
+            onCommand3=lambda *args: self._update_constrain_axes(row.index, constrain_enum, "Z", True),
+            offCommand1=lambda *args: self._update_constrain_axes(row.index, constrain_enum, "X", False),
+            offCommand2=lambda *args: self._update_constrain_axes(row.index, constrain_enum, "Y", False),
+            offCommand3=lambda *args: self._update_constrain_axes(row.index, constrain_enum, "Z", False)
+        )
+        return check_box
+
+    def _delete_constrain(self, index, constrain_enum: ConstrainEnum):
+        self.model.remove_constraint(index, constrain_enum)
+        return
+
+    def _create_constrain_axes(self, index, constrain_enum: ConstrainEnum):
+        self.model.set_constraint(index, constrain_enum)
+
+    def _update_constrain_axes(self, index: int, constrain_enum: ConstrainEnum, skip_axe: str, value: bool):
+        self.model.update_skip_axe(index, constrain_enum, skip_axe, value)
+
+    def _on_target_select(self, text_field, index: int):
+        selected_list = pymel.ls(selection=True)
+        if len(selected_list) == 0:
+            return
+
+        target = selected_list[0]
+        pymel.textFieldGrp(text_field, edit=True, text=target)
+        self.model.set_target(index, target.name())
+        return
+
+    @PERFORMANCE_STATS.timed("apply")
+    def _apply_constrains(self, *args):
+        if pymel.checkBox(self.incrementalCheckBox, query=True, value=True):
+            summary = self.model.reapply(MayaConstraintBackend(), MayaApplyProgress(), self._get_chunk_size())
+        else:
+            summary = self.model.apply(MayaConstraintBackend(), MayaApplyProgress(), self._get_chunk_size())
+        if not self._check_validation(summary) or self._check_cancelled(summary):
+            return summary
+        print("++++ constraints created: {} ++++".format(summary["created"]))
+        if "unchanged" in summary:
+            print("++++ {} constraints unchanged, {} deleted ++++".format(summary["unchanged"], summary["deleted"]))
+        return summary
+
+    @PERFORMANCE_STATS.timed("applyToNamespaces")
+    def _apply_to_namespaces(self):
+        template = MappingTemplate(self.model)
+        namespace_pairs = MappingTemplate.parse_namespace_pairs(
+            pymel.textFieldButtonGrp(self.namespacesField, query=True, text=True), template.sourceNamespace)
+        if len(namespace_pairs) == 0:
+            print("++++ no target namespace given ++++")
+            return
+
+        summary = template.apply(namespace_pairs, MayaConstraintBackend(), MayaApplyProgress(),
+                                 self._get_chunk_size())
+        if not self._check_validation(summary) or self._check_cancelled(summary):
+            return summary
+        print("++++ constraints created for {} namespaces: {} ++++".format(len(namespace_pairs), summary["created"]))
+        return summary
+
+    def _get_chunk_size(self) -> int:
+        return pymel.intField(self.chunkSizeField, query=True, value=True)
+
+    @staticmethod
+    def _check_cancelled(summary: dict) -> bool:
+        if summary.get("cancelled"):
+            print("++++ apply cancelled, {} created constraints removed ++++".format(summary["rolledBack"]))
+        return summary.get("cancelled", False)
+
+    @staticmethod
+    def _check_validation(summary: dict) -> bool:
+        report = summary.get("validation")
+        if report is None:
+            return True
+
+        MappingValidator.print_report(report)
+        if not report["valid"]:
+            print("++++ nothing was changed, {} errors found ++++".format(len(report["errors"])))
+        return report["valid"]
+
+    @PERFORMANCE_STATS.timed("validate")
+    def _validate_mapping(self, *args):
+        report = self.model.validate(MayaConstraintBackend())
+        MappingValidator.print_report(report)
+        print("++++ validation: {} errors, {} warnings ++++".format(len(report["errors"]), len(report["warnings"])))
+        return report
+
+    @PERFORMANCE_STATS.timed("applyAndBake")
+    def _apply_and_bake(self, *args):
+        start = pymel.floatFieldGrp(self.bakeRangeField, query=True, value1=True)
+        end = pymel.floatFieldGrp(self.bakeRangeField, query=True, value2=True)
+        if end < start:
+            print("++++ invalid bake range: {} - {} ++++".format(start, end))
+            return
+
+        summary = self.model.apply_and_bake(start, end, MayaConstraintBackend(), MayaApplyProgress(),
+                                            self._get_chunk_size())
+        if not self._check_validation(summary) or self._check_cancelled(summary):
+            return summary
+        print("++++ {} attributes baked from {} to {} ++++".format(summary.get("baked", 0), start, end))
+        return summary
+
+    @PERFORMANCE_STATS.timed("retarget")
+    def _retarget_keys(self, *args):
+        start = pymel.floatFieldGrp(self.bakeRangeField, query=True, value1=True)
+        end = pymel.floatFieldGrp(self.bakeRangeField, query=True, value2=True)
+        if end < start:
+            print("++++ invalid bake range: {} - {} ++++".format(start, end))
+            return
+
+        summary = self.model.retarget(start, end)
+        print("++++ {} targets retargeted over {} frames ++++".format(summary["targets"], summary["frames"]))
+        return summary
+
+    @PERFORMANCE_STATS.timed("copyAnimation")
+    def _copy_animation(self, *args):
+        offset = pymel.floatFieldGrp(self.timeRemapField, query=True, value1=True)
+        scale = pymel.floatFieldGrp(self.timeRemapField, query=True, value2=True)
+        if scale <= 0.0:
+            print("++++ time scale must be positive ++++")
+            return
+
+        summary = self.model.copy_animation(offset, scale, MayaAnimCurveBackend())
+        print("++++ {} curves copied ({} keys), {} source channels without animation ++++".format(
+            summary["curves"], summary["keys"], len(summary["missing"])))
+        return summary
+
+    def _clear_UI(self, *args):
+        self._cancel_loading()
+        for ui in self.targetUIList:
+            pymel.deleteUI(ui)
+
+        self.targetUIList.clear()
+        self.model.clear()
+        self.sourceXTargetLayouts.clear()
+        self.rowViews.clear()
+        self.filteredIndices.clear()
+        self.selectedRows.clear()
+        self.sourceDepths = None
+        self.rowsFilter = ""
+        self.depthFilter = ""
+        self.currentPage = 0
+        pymel.textFieldGrp(self.sourceTextfield,edit=True,text="")
+
+        self._create_target_section()
+        return
+
+    @staticmethod
+    @PERFORMANCE_STATS.timed("deleteConstraints")
+    def _delete_constraints(*args):
+        constraints = pymel.ls(type=list(CONSTRAIN_COMMANDS.values()))
+        if len(constraints) > 0:
+            pymel.delete(constraints)
+
+        print("++++ constraints deleted ++++")
+
+    @PERFORMANCE_STATS.timed("deleteCreatedConstraints")
+    def _delete_created_constraints(self, this_mapping_only: bool):
+        deleted = self.model.delete_created_constraints(this_mapping_only, MayaConstraintBackend())
+        print("++++ {} created nodes deleted ++++".format(deleted))
+
+    def _save_as_json(self, *args):
+        if not self._validate_self_data():
+            print("There is no constraints configuration to save")
+            return
+
+        save_file = pymel.fileDialog2(
+            fileFilter=MAPPING_FILE_FILTER,
+            dialogStyle=2
+        )
+
+        if save_file is not None and len(save_file) > 0:
+            self.model.save(save_file[0])
+
+    def _load_json(self, *args):
+        load_file = pymel.fileDialog2(
+            fileFilter=MAPPING_FILE_FILTER,
+            fileMode=1,
+            dialogStyle=2
+        )
+        if load_file is None or len(load_file) == 0:
+            return
+
+        file_name = load_file[0]
+        self._start_loading(lambda task: MatchingModel.iter_json_batches(file_name, task=task), "json.load")
+        return
+
+    def _validate_self_data(self) -> bool:
+        return len(self.model) > 0
+
+
+class SceneBackend(ABC):
+    # scene I/O used by the batch runner, one instance per worker process
+
+    def initialize(self):
+        return
+
+    @abstractmethod
+    def open_scene(self, path: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def process(self, model: "MatchingModel", mode: str, options: dict) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_scene(self, path: str):
+        raise NotImplementedError
+
+
+class MayaSceneBackend(SceneBackend):
+
+    def initialize(self):
+        # importing pymel in mayapy already starts maya.standalone
+        if not pymel.lazy_is_available():
+            raise ImportError("the maya scene backend needs to run in mayapy")
+        # node handles stay cached for the whole batch, every scene reuses the names of the previous one
+        NODE_HANDLE_CACHE.install_callbacks("batch")
+
+    def open_scene(self, path: str):
+        pymel.openFile(path, force=True)
+
+    def process(self, model: "MatchingModel", mode: str, options: dict) -> dict:
+        if mode == "apply":
+            return model.apply(MayaConstraintBackend())
+        elif mode == "bake":
+            return model.apply_and_bake(options["start"], options["end"], MayaConstraintBackend())
+        elif mode == "copy":
+            return model.copy_animation(options["offset"], options["scale"], MayaAnimCurveBackend())
+        elif mode == "retarget":
+            return model.retarget(options["start"], options["end"])
+        raise ValueError("unknown batch mode: {}".format(mode))
+
+    def save_scene(self, path: str):
+        pymel.saveAs(path, force=True)
+
+
+class InMemorySceneBackend(SceneBackend):
+    # stand-in scenes: nothing is read or written, the mapping goes through the in-memory backends
+
+    def open_scene(self, path: str):
+        if not os.path.exists(path):
+            raise IOError("scene {} doesn't exist".format(path))
+        self.constraintBackend = InMemoryConstraintBackend()
+        self.curveBackend = InMemoryAnimCurveBackend()
+
+    def process(self, model: "MatchingModel", mode: str, options: dict) -> dict:
+        if mode == "apply":
+            return model.apply(self.constraintBackend)
+        elif mode == "bake":
+            return model.apply_and_bake(options["start"], options["end"], self.constraintBackend)
+        elif mode == "copy":
+            return model.copy_animation(options["offset"], options["scale"], self.curveBackend)
+        raise ValueError("mode {} is not supported by the in memory backend".format(mode))
+
+    def save_scene(self, path: str):
+        return
+
+
+SCENE_BACKENDS = {
+    "maya": MayaSceneBackend,
+    "memory": InMemorySceneBackend
+}
+
+
+class BatchRunner(object):
+    # opens, processes and saves every scene with a pool of worker processes and reports per scene timings
+    _workerState = {}
+
+    def __init__(self, backend_name: str = "maya", workers: int = 1):
+        self.backendName = backend_name
+        self.workers = max(1, workers)
+
+    @staticmethod
+    def expand_scenes(patterns: list) -> list:
+        scenes = []
+        for pattern in patterns:
+            matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+            for scene in matches:
+                if scene not in scenes:
+                    scenes.append(scene)
+        return scenes
+
+    def run(self, mapping_file: str, scenes: list, mode: str, options: dict) -> dict:
+        start_time = time.perf_counter()
+        jobs = [(scene, mode, options) for scene in scenes]
+        # read once here, a missing or broken mapping fails every scene without starting any worker
+        model = MatchingModel.from_json(mapping_file)
+        initialize_arguments = (self.backendName, model)
+        if model is None:
+            results = [{"scene": scene, "status": "error", "seconds": {"total": 0.0},
+                        "error": "the mapping file {} couldn't be loaded".format(mapping_file)} for scene in scenes]
+        elif self.workers == 1 or len(jobs) <= 1:
+            BatchRunner._initialize_worker(*initialize_arguments)
+            results = [BatchRunner._process_scene(job) for job in jobs]
+        else:
+            # imported here, only batch runs pay for it. Spawn: a forked Maya session is not safe to use
+            import multiprocessing
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(min(self.workers, len(jobs)), BatchRunner._initialize_worker,
+                              initialize_arguments) as pool:
+                results = pool.map(BatchRunner._process_scene, jobs, chunksize=1)
+
+        return {
+            "mapping": mapping_file,
+            "mode": mode,
+            "options": options,
+            "workers": self.workers,
+            "scenes": results,
+            "failed": sum(1 for result in results if result["status"] != "ok"),
+            "seconds": time.perf_counter() - start_time
+        }
+
+    @staticmethod
+    def _initialize_worker(backend_name: str, model: "MatchingModel"):
+        # an exception raised by a pool initializer makes the pool respawn workers forever, it is reported
+        # by every scene of the worker instead
+        BatchRunner._workerState["model"] = model
+        BatchRunner._workerState["error"] = None
+        try:
+            backend = SCENE_BACKENDS[backend_name]()
+            backend.initialize()
+            BatchRunner._workerState["backend"] = backend
+        except Exception as error:
+            BatchRunner._workerState["error"] = "{}: {}".format(type(error).__name__, error)
+
+    @staticmethod
+    def _process_scene(job: tuple) -> dict:
+        scene, mode, options = job
+        backend = BatchRunner._workerState.get("backend")
+        model = BatchRunner._workerState["model"]
+        result = {"scene": scene, "status": "ok", "seconds": {}}
+        output_scene = scene
+        if options.get("outputDirectory"):
+            output_scene = os.path.join(options["outputDirectory"], os.path.basename(scene))
+
+        start_time = time.perf_counter()
+        step_time = start_time
+        try:
+            if BatchRunner._workerState["error"] is not None:
+                raise RuntimeError("worker initialization failed, {}".format(BatchRunner._workerState["error"]))
+            for step in ("open", "process", "save"):
+                if step == "open":
+                    backend.open_scene(scene)
+                elif step == "process":
+                    # every scene gets its own copy, appliers never share state between scenes
+                    result["summary"] = backend.process(model.copy(), mode, options)
+                    validation = result["summary"].get("validation")
+                    if validation is not None and not validation["valid"]:
+                        # nothing was applied, the scene is not saved
+                        raise ValueError("the mapping is not valid in this scene, {} errors".format(
+                            len(validation["errors"])))
+                elif not options.get("noSave"):
+                    backend.save_scene(output_scene)
+                now = time.perf_counter()
+                result["seconds"][step] = now - step_time
+                step_time = now
+        except Exception as error:
+            result["status"] = "error"
+            result["error"] = "{}: {}".format(type(error).__name__, error)
+
+        result["seconds"]["total"] = time.perf_counter() - start_time
+        return result
+
+
+def get_batch_arguments_parser():
+    import argparse
+    parser = argparse.ArgumentParser(description="Applies a constraints matching mapping to many scene files.")
+    parser.add_argument("mapping", help="mapping file (.json or .json.gz)")
+    parser.add_argument("scenes", nargs="+", help="scene files or glob patterns")
+    parser.add_argument("--mode", choices=["apply", "bake", "copy", "retarget"], default="apply")
+    parser.add_argument("--start", type=float, default=1.0, help="first frame for bake/retarget")
+    parser.add_argument("--end", type=float, default=120.0, help="last frame for bake/retarget")
+    parser.add_argument("--offset", type=float, default=0.0, help="time offset for copy")
+    parser.add_argument("--scale", type=float, default=1.0, help="time scale for copy")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--output-directory", default="", help="save the scenes there instead of in place")
+    parser.add_argument("--no-save", action="store_true", help="don't save the processed scenes")
+    parser.add_argument("--report", default="", help="json report file, printed when not given")
+    parser.add_argument("--backend", choices=sorted(SCENE_BACKENDS.keys()), default="maya")
+    return parser
+
+
+def main(argv: list = None) -> int:
+    arguments = get_batch_arguments_parser().parse_args(argv)
+    scenes = BatchRunner.expand_scenes(arguments.scenes)
+    options = {
+        "start": arguments.start,
+        "end": arguments.end,
+        "offset": arguments.offset,
+        "scale": arguments.scale,
+        "outputDirectory": arguments.output_directory,
+        "noSave": arguments.no_save
+    }
+    report = BatchRunner(arguments.backend, arguments.workers).run(arguments.mapping, scenes, arguments.mode, options)
+
+    if arguments.report != "":
+        with open(arguments.report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        print("++++ report saved to {} ++++".format(arguments.report))
+    else:
+        print(json.dumps(report, indent=2))
+
+    for result in report["scenes"]:
+        print("++++ {} {} {:.2f}s ++++".format(result["status"], result["scene"], result["seconds"]["total"]))
+    return 1 if report["failed"] > 0 else 0
+
+
+def print_performance_stats():
+    PERFORMANCE_STATS.print_report()
+
+
+def create_matching_constraints_tool():
+    constraints_tool = ConstrainsMatchingTool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tool module sits at the repository root, next to its plug-in loader
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
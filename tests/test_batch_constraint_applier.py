@@ -0,0 +1,132 @@
+import pytest
+
+from animationToolCore import (BatchConstraintApplier, ConstrainEnum, ConstraintApplyPlan, InMemoryApplyProgress,
+                               InMemoryConstraintBackend, MatchingModel)
+
+
+def make_model() -> MatchingModel:
+    model = MatchingModel(["src:hips", "src:spine"])
+    model.set_target(0, "A")
+    model.set_target(1, "B")
+    model.set_constraint(0, ConstrainEnum.PARENT_CONSTRAIN)
+    model.set_constraint(1, ConstrainEnum.PARENT_CONSTRAIN)
+    return model
+
+
+def test_plan_groups_rows_by_type_and_skip_axes():
+    model = MatchingModel(["src:hips", "src:spine", "src:head", "src:L_arm"])
+    for i, target in enumerate(["A", "B", "C", ""]):
+        model.set_target(i, target)
+    model.set_constraint(0, ConstrainEnum.PARENT_CONSTRAIN)
+    model.set_constraint(1, ConstrainEnum.PARENT_CONSTRAIN)
+    model.set_constraint(1, ConstrainEnum.SCALE_CONSTRAIN, (False, False, True))
+    model.set_constraint(2, ConstrainEnum.PARENT_CONSTRAIN, (True, False, False))
+    model.set_constraint(3, ConstrainEnum.POINT_CONSTRAIN)
+
+    plan = model.get_apply_plan()
+    assert plan.groups == {
+        (ConstrainEnum.PARENT_CONSTRAIN, (False, False, False)): [("src:hips", "A"), ("src:spine", "B")],
+        (ConstrainEnum.SCALE_CONSTRAIN, (False, False, True)): [("src:spine", "B")],
+        (ConstrainEnum.PARENT_CONSTRAIN, (True, False, False)): [("src:head", "C")]
+    }
+    assert plan.get_constraints_count() == 4
+
+
+def test_plan_skips_rows_without_target_or_constraint():
+    plan = ConstraintApplyPlan.from_rows(["a", "b", "c"], ["A", "", "C"], [{}, {}, {}])
+    assert plan.rowsCount == 3
+    assert plan.skippedRows == [0, 1, 2]
+    assert plan.is_empty()
+
+
+def test_apply_summary_and_undo_chunk():
+    model = make_model()
+    model.set_constraint(1, ConstrainEnum.SCALE_CONSTRAIN)
+    backend = InMemoryConstraintBackend()
+    summary = BatchConstraintApplier(backend, chunk_size=1).apply(model.get_apply_plan(), model.get_scope())
+
+    assert summary["rows"] == 2
+    assert summary["skippedRows"] == 0
+    assert summary["groups"] == 2
+    assert summary["created"] == {"parentConstraint": 2, "scaleConstraint": 1}
+    assert sorted(summary["nodes"]) == sorted(constraint["name"] for constraint in backend.constraints)
+    assert summary["validation"]["valid"]
+    assert backend.undoChunks == [BatchConstraintApplier.undoChunkName]
+    assert sorted(backend.get_registered_nodes(model.get_scope())) == sorted(summary["nodes"])
+
+
+def test_apply_stops_on_validation_errors():
+    model = make_model()
+    backend = InMemoryConstraintBackend(nodes=["src:hips", "src:spine", "A"])
+    summary = model.apply(backend)
+    assert not summary["validation"]["valid"]
+    assert backend.constraints == []
+    assert backend.undoChunks == []
+
+
+def test_cancelled_apply_reverts_its_undo_chunk():
+    model = make_model()
+    backend = InMemoryConstraintBackend()
+    summary = model.apply(backend, InMemoryApplyProgress(cancel_after=1), chunk_size=1)
+    assert summary["cancelled"]
+    assert summary["rolledBack"] == 1
+    assert backend.constraints == []
+    assert backend.registry == {}
+    assert backend.cancelledChunks == [BatchConstraintApplier.undoChunkName]
+
+
+@pytest.fixture
+def applied():
+    model = make_model()
+    backend = InMemoryConstraintBackend(nodes=["src:hips", "src:spine", "mocap:hips", "A", "B", "C"])
+    model.apply(backend)
+    return model, backend
+
+
+def get_targets(backend: InMemoryConstraintBackend) -> list:
+    return sorted(constraint["target"] for constraint in backend.constraints)
+
+
+def test_reapply_keeps_unchanged_rows(applied):
+    model, backend = applied
+    summary = model.reapply(backend)
+    assert summary["unchanged"] == 2
+    assert summary["deleted"] == 0
+    assert get_targets(backend) == ["A", "B"]
+
+
+def test_reapply_deletes_the_constraint_of_a_changed_target(applied):
+    model, backend = applied
+    model.set_target(0, "C")
+    summary = model.reapply(backend)
+    assert summary["deleted"] == 1
+    assert get_targets(backend) == ["B", "C"]
+    assert sorted(backend.get_registered_nodes(model.get_scope())) == sorted(
+        constraint["name"] for constraint in backend.constraints)
+
+
+def test_reapply_deletes_the_constraint_of_a_cleared_target(applied):
+    model, backend = applied
+    model.set_target(0, "")
+    summary = model.reapply(backend)
+    assert summary["deleted"] == 1
+    assert get_targets(backend) == ["B"]
+
+
+def test_reapply_deletes_an_unchecked_constraint(applied):
+    model, backend = applied
+    model.remove_constraint(1, ConstrainEnum.PARENT_CONSTRAIN)
+    summary = model.reapply(backend)
+    assert summary["deleted"] == 1
+    assert get_targets(backend) == ["A"]
+
+
+def test_reapply_leaves_other_scopes_alone(applied):
+    model, backend = applied
+    other = MatchingModel(["mocap:hips"])
+    other.set_target(0, "C")
+    other.set_constraint(0, ConstrainEnum.POINT_CONSTRAIN)
+    other.apply(backend)
+    model.set_target(1, "")
+    model.reapply(backend)
+    assert get_targets(backend) == ["A", "C"]
@@ -0,0 +1,64 @@
+import pytest
+
+from animationToolCore import BatchRunner, ConstrainEnum, MatchingModel
+
+
+@pytest.fixture
+def mapping_file(tmp_path):
+    model = MatchingModel(["src:hips", "src:spine"])
+    model.set_target(0, "tgt:hips")
+    model.set_target(1, "tgt:spine")
+    model.set_constraint(0, ConstrainEnum.PARENT_CONSTRAIN)
+    model.set_constraint(1, ConstrainEnum.ORIENT_CONSTRAIN)
+    path = str(tmp_path / "mapping.json")
+    model.save(path)
+    return path
+
+
+@pytest.fixture
+def scenes(tmp_path):
+    paths = []
+    for name in ("shot1.ma", "shot2.ma"):
+        path = tmp_path / name
+        path.write_text("")
+        paths.append(str(path))
+    return paths
+
+
+def run(mapping_file: str, scenes: list) -> dict:
+    return BatchRunner("memory").run(mapping_file, scenes, "apply", {})
+
+
+def test_every_scene_is_processed(mapping_file, scenes):
+    report = run(mapping_file, scenes)
+    assert report["failed"] == 0
+    assert [result["status"] for result in report["scenes"]] == ["ok", "ok"]
+    assert report["scenes"][0]["summary"]["created"] == {"parentConstraint": 1, "orientConstraint": 1}
+
+
+def test_a_missing_scene_only_fails_itself(mapping_file, scenes, tmp_path):
+    report = run(mapping_file, [str(tmp_path / "missing.ma")] + scenes)
+    assert [result["status"] for result in report["scenes"]] == ["error", "ok", "ok"]
+    assert report["failed"] == 1
+    assert "open" not in report["scenes"][0]["seconds"]
+
+
+def test_a_missing_mapping_fails_every_scene(scenes, tmp_path):
+    report = run(str(tmp_path / "missing.json"), scenes)
+    assert report["failed"] == 2
+    assert all("couldn't be loaded" in result["error"] for result in report["scenes"])
+
+
+def test_a_validation_failure_fails_the_scene(scenes, tmp_path):
+    model = MatchingModel(["src:hips"])
+    model.set_target(0, "src:hips")
+    model.set_constraint(0, ConstrainEnum.PARENT_CONSTRAIN)
+    path = str(tmp_path / "selfConstrained.json")
+    model.save(path)
+
+    report = run(path, scenes)
+    assert report["failed"] == 2
+    for result in report["scenes"]:
+        assert result["status"] == "error"
+        assert not result["summary"]["validation"]["valid"]
+        assert "save" not in result["seconds"]
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from animationToolCore import ConstrainEnum, JsonDataManager, MatchingModel
+
+
+def make_model() -> MatchingModel:
+    model = MatchingModel(["src:hips", "src:spine", "src:L_arm", "src:head"])
+    model.set_target(0, "tgt:hips")
+    model.set_target(1, "tgt:spine")
+    model.set_target(2, "tgt:L_arm")
+    model.set_constraint(0, ConstrainEnum.PARENT_CONSTRAIN, (False, True, False))
+    model.set_constraint(1, ConstrainEnum.ORIENT_CONSTRAIN, (True, False, True))
+    model.set_constraint(2, ConstrainEnum.POINT_CONSTRAIN)
+    model.set_constraint(2, ConstrainEnum.SCALE_CONSTRAIN, (False, False, True))
+    return model
+
+
+def get_rows(model: MatchingModel) -> list:
+    return [(row.source, row.target,
+             {constrain_enum: constrain.get_axes_tuple() for constrain_enum, constrain in row.constraints.items()})
+            for row in model.rows]
+
+
+def get_version_1_data(model: MatchingModel) -> dict:
+    # the layout written by the first version of the tool
+    return {
+        "sources": model.get_sources(),
+        "targets": model.get_targets(),
+        "constraints": [{str(constrain_enum.value): constrain.get_serialized_dict()
+                         for constrain_enum, constrain in constraints.items()}
+                        for constraints in model.get_constraints()]
+    }
+
+
+@pytest.mark.parametrize("file_name", ["mapping.json", "mapping.json.gz"])
+def test_version_2_round_trip(tmp_path, file_name):
+    model = make_model()
+    model.save(str(tmp_path / file_name))
+
+    loaded = MatchingModel.from_json(str(tmp_path / file_name))
+    assert loaded is not None
+    assert get_rows(loaded) == get_rows(model)
+
+
+def test_version_2_header(tmp_path):
+    make_model().save(str(tmp_path / "mapping.json"))
+
+    with open(str(tmp_path / "mapping.json")) as mapping_file:
+        header = json.loads(mapping_file.readline())
+        rows = [json.loads(line) for line in mapping_file]
+    assert header["format"] == JsonDataManager.fileFormat
+    assert header["version"] == JsonDataManager.version
+    assert header["rows"] == len(rows) == 4
+    # identical specs are shared through the header table
+    assert len(header["specs"]) == 4
+
+
+@pytest.mark.parametrize("indent", [None, 4])
+def test_version_1_files_load(tmp_path, indent):
+    model = make_model()
+    with open(str(tmp_path / "mapping.json"), "w") as mapping_file:
+        json.dump(get_version_1_data(model), mapping_file, indent=indent)
+
+    loaded = MatchingModel.from_json(str(tmp_path / "mapping.json"))
+    assert loaded is not None
+    assert get_rows(loaded) == get_rows(model)
+
+
+def test_version_1_resaved_as_version_2(tmp_path):
+    model = make_model()
+    with open(str(tmp_path / "old.json"), "w") as mapping_file:
+        json.dump(get_version_1_data(model), mapping_file, indent=4)
+
+    MatchingModel.from_json(str(tmp_path / "old.json")).save(str(tmp_path / "new.json.gz"))
+    assert get_rows(MatchingModel.from_json(str(tmp_path / "new.json.gz"))) == get_rows(model)
+
+
+def test_data_manager_round_trip(tmp_path):
+    model = make_model()
+    data_manager = JsonDataManager()
+    data_manager.set_data(model.get_sources(), model.get_targets(), model.get_constraints())
+    data_manager.save(str(tmp_path / "mapping.json.gz"))
+
+    loaded = JsonDataManager()
+    assert loaded.load(str(tmp_path / "mapping.json.gz"))
+    assert loaded.get_data("s") == model.get_sources()
+    assert loaded.get_data("t") == model.get_targets()
+    assert [{key: value.get_skip_mask() for key, value in row.items()} for row in loaded.get_data("c")] == \
+           [{key: value.get_skip_mask() for key, value in row.items()} for row in model.get_constraints()]
+
+
+def test_invalid_files(tmp_path):
+    with open(str(tmp_path / "other.json"), "w") as mapping_file:
+        json.dump({"something": []}, mapping_file)
+    with open(str(tmp_path / "newer.json"), "w") as mapping_file:
+        mapping_file.write(json.dumps({"format": JsonDataManager.fileFormat, "version": 99, "rows": 0,
+                                       "specs": []}) + "\n")
+
+    assert MatchingModel.from_json(str(tmp_path / "other.json")) is None
+    assert MatchingModel.from_json(str(tmp_path / "newer.json")) is None
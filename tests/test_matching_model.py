@@ -0,0 +1,35 @@
+import pytest
+
+from animationToolCore import MatchingModel, SymmetryPairer
+
+
+def make_model() -> MatchingModel:
+    return MatchingModel(["src:hips", "src:spine", "src:L_arm", "src:L_hand"])
+
+
+def test_find_rows_by_name_and_depth():
+    model = make_model()
+    depths = {"src:hips": 0, "src:spine": 1, "src:L_arm": 2, "src:L_hand": 3}
+    assert model.find_rows("l_*") == [2, 3]
+    assert model.find_rows("", (1, 2), depths) == [1, 2]
+    assert model.find_rows("l_", (3, 3), depths) == [3]
+
+
+def test_find_rows_depth_range_needs_depths():
+    with pytest.raises(ValueError):
+        make_model().find_rows("", (0, 1))
+
+
+@pytest.mark.parametrize("name, mirror_name", [
+    ("L_arm", "R_arm"),
+    ("spine_l_01", "spine_r_01"),
+    ("ns:Left_leg", "ns:Right_leg"),
+    ("leftArm", "rightArm"),
+    ("arm_RIGHT", "arm_LEFT"),
+    ("upright_jnt", ""),
+    ("Bright", ""),
+    ("copyright_ctl", ""),
+    ("RIG_root", "")
+])
+def test_mirror_names_only_swap_whole_side_tokens(name, mirror_name):
+    assert SymmetryPairer().get_mirror_name(name) == mirror_name
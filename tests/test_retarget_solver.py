@@ -0,0 +1,111 @@
+import numpy
+import pytest
+
+from animationToolCore import (ConstrainEnum, InMemoryAnimCurveBackend, InMemoryMatrixSampler, MatchingModel,
+                               RetargetSolver, ROTATE_ORDERS)
+
+FRAMES = [1.0, 2.0, 3.0]
+
+
+def get_axis_rotation(axis: int, angle: float):
+    rotate = numpy.zeros(3)
+    rotate[axis] = angle
+    return RetargetSolver.get_rotation(rotate)
+
+
+def get_matrix(translate=(0.0, 0.0, 0.0), rotate=(0.0, 0.0, 0.0)):
+    return RetargetSolver.compose(numpy.array(translate, dtype=float), numpy.array(rotate, dtype=float), numpy.ones(3))
+
+
+@pytest.mark.parametrize("rotate_order", range(len(ROTATE_ORDERS)))
+def test_rotate_order_applies_the_axes_in_order(rotate_order):
+    angles = numpy.array([0.3, -0.4, 0.5])
+    first, second, third = ROTATE_ORDERS[rotate_order]
+    expected = get_axis_rotation(first, angles[first]) @ get_axis_rotation(second, angles[second]) @ \
+        get_axis_rotation(third, angles[third])
+    assert numpy.allclose(RetargetSolver.get_rotation(angles[None], [rotate_order])[0], expected)
+
+
+@pytest.mark.parametrize("rotate_order", range(len(ROTATE_ORDERS)))
+def test_compose_decompose_round_trip(rotate_order):
+    generator = numpy.random.default_rng(rotate_order)
+    translate = generator.normal(size=(4, 2, 3))
+    rotate = generator.uniform(-1.2, 1.2, size=(4, 2, 3))
+    scale = generator.uniform(0.5, 2.0, size=(4, 2, 3))
+    rotate_orders = [rotate_order, (rotate_order + 3) % len(ROTATE_ORDERS)]
+    joint_orients = generator.uniform(-1.0, 1.0, size=(2, 3))
+
+    matrices = RetargetSolver.compose(translate, rotate, scale, rotate_orders, joint_orients)
+    result = RetargetSolver.decompose(matrices, rotate_orders, joint_orients)
+    for expected, value in zip((translate, rotate, scale), result):
+        assert numpy.allclose(value, expected)
+
+
+def make_model(rows: list) -> MatchingModel:
+    model = MatchingModel([source for source, target, constrain_enum in rows])
+    for i, (source, target, constrain_enum) in enumerate(rows):
+        model.set_target(i, target)
+        model.set_constraint(i, constrain_enum)
+    return model
+
+
+def get_values(curves: InMemoryAnimCurveBackend, target: str, channel: str):
+    return numpy.array([curves.curves["{}.{}{}".format(target, channel, axe)].values for axe in "xyz"]).T
+
+
+def test_retarget_follows_the_sources_with_joint_orients_and_rotate_orders():
+    generator = numpy.random.default_rng(0)
+    world_matrices = {}
+    for node in ("src:root", "src:arm", "A", "B"):
+        world_matrices[node] = {frame: get_matrix(generator.normal(size=3), generator.uniform(-1.0, 1.0, size=3))
+                                for frame in FRAMES}
+    rotate_orders = {"A": 5, "B": 1}
+    joint_orients = {"A": (0.3, -0.2, 0.5), "B": (0.1, 0.4, -0.3)}
+    sampler = InMemoryMatrixSampler(world_matrices, {"B": "A"}, rotate_orders, joint_orients)
+    curves = InMemoryAnimCurveBackend()
+    model = make_model([("src:root", "A", ConstrainEnum.PARENT_CONSTRAIN),
+                        ("src:arm", "B", ConstrainEnum.PARENT_CONSTRAIN)])
+
+    summary = model.retarget(1.0, 3.0, 1.0, sampler, curves)
+    assert summary["curves"] == 12
+
+    offsets = {target: world_matrices[target][1.0] @ numpy.linalg.inv(world_matrices[source][1.0])
+               for source, target in (("src:root", "A"), ("src:arm", "B"))}
+    local = {target: RetargetSolver.compose(get_values(curves, target, "t"), get_values(curves, target, "r"),
+                                            numpy.ones((len(FRAMES), 3)), [rotate_orders[target]] * len(FRAMES),
+                                            numpy.array([joint_orients[target]] * len(FRAMES)))
+             for target in ("A", "B")}
+    for f, frame in enumerate(FRAMES):
+        assert numpy.allclose(local["A"][f], offsets["A"] @ world_matrices["src:root"][frame])
+        assert numpy.allclose(local["B"][f] @ local["A"][f], offsets["B"] @ world_matrices["src:arm"][frame])
+
+
+def test_retarget_keeps_the_unwritten_channels_of_a_parent_target():
+    # the parent target only follows the rotation, its child has to move with the source root on its own
+    world_matrices = {
+        "src:root": {frame: get_matrix((frame - 1.0, 0.0, 0.0)) for frame in FRAMES},
+        "src:arm": {frame: get_matrix((frame - 1.0, 1.0, 0.0)) for frame in FRAMES},
+        "A": {frame: get_matrix() for frame in FRAMES},
+        "B": {frame: get_matrix((0.0, 1.0, 0.0)) for frame in FRAMES}
+    }
+    sampler = InMemoryMatrixSampler(world_matrices, {"B": "A"})
+    curves = InMemoryAnimCurveBackend()
+    model = make_model([("src:root", "A", ConstrainEnum.ORIENT_CONSTRAIN),
+                        ("src:arm", "B", ConstrainEnum.PARENT_CONSTRAIN)])
+
+    model.retarget(1.0, 3.0, 1.0, sampler, curves)
+    assert "A.tx" not in curves.curves
+    assert numpy.allclose(get_values(curves, "B", "t"), [[0.0, 1.0, 0.0], [1.0, 1.0, 0.0], [2.0, 1.0, 0.0]])
+
+
+def test_retarget_point_rows_keep_a_world_offset():
+    world_matrices = {
+        "src:root": {frame: get_matrix((frame, 0.0, 0.0), (0.0, 0.0, frame)) for frame in FRAMES},
+        "A": {frame: get_matrix((0.0, 2.0, 0.0)) for frame in FRAMES}
+    }
+    sampler = InMemoryMatrixSampler(world_matrices)
+    curves = InMemoryAnimCurveBackend()
+    model = make_model([("src:root", "A", ConstrainEnum.POINT_CONSTRAIN)])
+
+    model.retarget(1.0, 3.0, 1.0, sampler, curves)
+    assert numpy.allclose(get_values(curves, "A", "t"), [[0.0, 2.0, 0.0], [1.0, 2.0, 0.0], [2.0, 2.0, 0.0]])